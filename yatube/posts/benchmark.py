@@ -0,0 +1,166 @@
+"""Нагрузочный прогон страниц posts на синтетических данных.
+
+build_dataset() заполняет базу пользователями, группами, постами (часть
+с картинками), подписками и комментариями через обычные save(), так
+что счётчики, ленты и поисковый индекс заполняются как в жизни.
+run_scenario() гоняет одну страницу тестовым клиентом из нескольких
+потоков и считает запросы в секунду, перцентили времени ответа и
+SQL-запросы на запрос, run_mix() - несколько страниц одновременно,
+например чтение ленты под запись комментариев. Используется командой
+manage.py bench.
+"""
+import random
+import statistics
+import threading
+import time
+
+from django.db import connection
+from django.test import Client
+
+from .generator import placeholder_images
+from .models import Comment, Follow, Group, Post, User
+from .query_budget import QueryCounter
+
+# адрес не из INTERNAL_IPS: debug toolbar не встраивается в ответы
+CLIENT_ADDRESS = '10.0.0.1'
+
+
+def build_dataset(users, groups, posts, comments, follows, image_share,
+                  seed):
+    rng = random.Random(seed)
+    authors = [
+        User.objects.create_user(username=f'bench{i}')
+        for i in range(users)
+    ]
+    all_groups = [
+        Group.objects.create(
+            title=f'Группа {i}', slug=f'bench-{i}', description='Описание')
+        for i in range(groups)
+    ]
+    images = placeholder_images(rng, 'bench') if image_share else []
+    all_posts = []
+    for i in range(posts):
+        post = Post(
+            author=rng.choice(authors),
+            group=rng.choice(all_groups + [None]) if all_groups else None,
+            text=f'Синтетический пост {i}\n\nВторой абзац поста {i}.',
+        )
+        if images and rng.random() < image_share:
+            post.image = rng.choice(images)
+            post.image_width, post.image_height = 640, 480
+        post.save()
+        all_posts.append(post)
+    pairs = set()
+    while len(pairs) < min(follows, users * (users - 1)):
+        user, author = rng.sample(authors, 2)
+        if (user.pk, author.pk) not in pairs:
+            pairs.add((user.pk, author.pk))
+            Follow.objects.create(user=user, author=author)
+    for i in range(comments):
+        Comment.objects.create(
+            post=rng.choice(all_posts), author=rng.choice(authors),
+            text=f'Комментарий {i}')
+    return {
+        'users': users, 'groups': groups, 'posts': posts,
+        'comments': comments, 'follows': len(pairs),
+    }
+
+
+def _percentile(timings, share):
+    return timings[min(len(timings) - 1, int(len(timings) * share))]
+
+
+def _timed(request, client, number):
+    """Время ответа в мс, число SQL-запросов и статус или ошибка."""
+    counter = QueryCounter()
+    started = time.perf_counter()
+    try:
+        with connection.execute_wrapper(counter):
+            status = request(client, number).status_code
+    except Exception as error:
+        # например, database is locked под конкурентной записью
+        status = type(error).__name__
+    elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, counter.queries, status
+
+
+def run_scenario(request, requests, concurrency, user=None):
+    """Гоняет request(client, i) requests раз из concurrency потоков.
+
+    Ошибкой считается исключение или ответ не 200, 302 и 304.
+    """
+    return run_mix({'': (request, concurrency, user)}, requests)['']
+
+
+def run_mix(loads, requests):
+    """Гоняет несколько нагрузок одновременно, например чтение и запись.
+
+    loads - имя -> (request, concurrency, user); у каждой нагрузки
+    requests запросов и свой отчёт, как у run_scenario.
+    """
+    lock = threading.Lock()
+    states = {
+        name: {
+            'numbers': iter(range(requests)), 'timings': [], 'queries': [],
+            'errors': [], 'finished': None,
+        }
+        for name in loads
+    }
+
+    def worker(name, request, user):
+        state = states[name]
+        client = Client(REMOTE_ADDR=CLIENT_ADDRESS)
+        if user is not None:
+            client.force_login(user)
+        try:
+            while True:
+                with lock:
+                    number = next(state['numbers'], None)
+                if number is None:
+                    return
+                elapsed, count, status = _timed(request, client, number)
+                with lock:
+                    if status not in (200, 302, 304):
+                        state['errors'].append(status)
+                    state['timings'].append(elapsed)
+                    state['queries'].append(count)
+        finally:
+            connection.close()
+            with lock:
+                state['finished'] = time.perf_counter()
+
+    threads = [
+        threading.Thread(target=worker, args=(name, request, user))
+        for name, (request, concurrency, user) in loads.items()
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # у нагрузки без потоков нет и времени окончания
+    return {
+        name: _report(state, (state['finished'] or started) - started)
+        for name, state in states.items()
+    }
+
+
+def _report(state, elapsed):
+    timings = sorted(state['timings'])
+    if not timings:
+        # ни одного запроса, например --requests 0: нули вместо ошибки
+        return {
+            'requests': 0, 'errors': len(state['errors']), 'rps': 0,
+            'p50_ms': 0, 'p95_ms': 0, 'p99_ms': 0,
+            'queries_per_request': 0,
+        }
+    return {
+        'requests': len(timings),
+        'errors': len(state['errors']),
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(_percentile(timings, 0.5), 2),
+        'p95_ms': round(_percentile(timings, 0.95), 2),
+        'p99_ms': round(_percentile(timings, 0.99), 2),
+        'queries_per_request': round(statistics.mean(state['queries']), 2),
+    }
@@ -0,0 +1,350 @@
+"""Кеш, который отдаёт устаревшее значение, пока его пересчитывают.
+
+StaleWhileRevalidateCache - обёртка над другим кешем из
+settings.CACHES (его алиас указывается в LOCATION). Значение хранится
+дольше своего таймаута на GRACE секунд. Когда таймаут истёк, get()
+возвращает None только тому запросу, который первым захватил
+блокировку ключа, - он пересчитывает значение и кладёт его через
+set(). Остальные в это время получают устаревшее значение, а если
+значения ещё нет совсем (холодный ключ, новое поколение лент) - до
+WAIT секунд ждут, пока его положат. Чтобы популярные ключи не истекали
+у всех одновременно, пересчёт может начаться и чуть раньше таймаута
+(вероятностное раннее истечение, XFetch): тем вероятнее, чем ближе
+таймаут и чем дольше пересчёт.
+
+Обёртка работает с тегом {% cache %} (алиас template_fragments) и с
+get_or_set() в коде представлений. Счётчики попаданий, промахов и
+выдач устаревших значений копятся в памяти процесса, а в обёрнутый
+кеш переносятся при записи значения: чтение из кеша ничего не пишет.
+См. stats().
+
+SQLiteCache - общий для всех процессов кеш в файле SQLite в режиме
+WAL: читатели не ждут писателя, а сервис вроде Redis не нужен. Когда
+записей больше MAX_ENTRIES или они занимают больше MAX_SIZE байт,
+вытесняются давно не читанные (LRU).
+"""
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+STATS = ('hit', 'miss', 'stale')
+# счётчики процесса по алиасам; объекты кешей у каждого потока свои
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class StaleWhileRevalidateCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._alias = location or 'default'
+        self.grace = options.get('GRACE', 60)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        self.beta = options.get('BETA', 1.0)
+        self.wait = options.get('WAIT', 5)
+        self.poll = options.get('POLL', 0.05)
+
+    @property
+    def _cache(self):
+        # caches хранит объекты по потокам, поэтому берём его при вызове
+        return caches[self._alias]
+
+    def _lock_key(self, key):
+        return f'{key}:lock'
+
+    def _claim(self, key, version):
+        """Захватывает пересчёт ключа; в блокировке - время начала."""
+        return self._cache.add(
+            self._lock_key(key), time.time(), self.lock_timeout,
+            version=version)
+
+    def release(self, key, version=None):
+        """Отказ от пересчёта: значение класть не будут."""
+        self._cache.delete(self._lock_key(key), version=version)
+
+    def _count(self, stat):
+        with _stats_lock:
+            counts = _stats.setdefault(self._alias, dict.fromkeys(STATS, 0))
+            counts[stat] += 1
+
+    def _flush_stats(self):
+        with _stats_lock:
+            counts = _stats.pop(self._alias, {})
+        for stat, count in counts.items():
+            if not count:
+                continue
+            key = f'swr:{stat}'
+            try:
+                self._cache.incr(key, count)
+            except ValueError:
+                if not self._cache.add(key, count, None):
+                    self._cache.incr(key, count)
+
+    def _wait(self, key, version):
+        """Запись, которую пересчитывает другой запрос, или None."""
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            time.sleep(self.poll)
+            entry = self._cache.get(key, version=version)
+            if entry is not None:
+                return entry
+            lock_key = self._lock_key(key)
+            if (not self._cache.has_key(lock_key, version=version)
+                    and self._claim(key, version)):
+                # пересчёт бросили: считаем сами, остальные ждут нас
+                return None
+        return None
+
+    def _expired(self, fresh_until, delta):
+        early = delta * self.beta * -math.log(1 - random.random())
+        return time.time() + early >= fresh_until
+
+    def get(self, key, default=None, version=None):
+        entry = self._cache.get(key, version=version)
+        if entry is None:
+            if not self._claim(key, version):
+                entry = self._wait(key, version)
+            if entry is None:
+                self._count('miss')
+                return default
+            self._count('hit')
+            return entry[0]
+        value, fresh_until, delta = entry
+        if not self._expired(fresh_until, delta):
+            self._count('hit')
+            return value
+        if self._claim(key, version):
+            self._count('miss')
+            return default
+        self._count('stale')
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.get_backend_timeout(timeout)
+        now = time.time()
+        lock_key = self._lock_key(key)
+        started = self._cache.get(lock_key, version=version)
+        delta = now - started if started is not None else 0
+        if timeout is None:
+            fresh_until, stored_for = math.inf, None
+        else:
+            fresh_until, stored_for = timeout, timeout - now + self.grace
+        self._cache.set(
+            key, (value, fresh_until, delta), stored_for, version=version)
+        self._cache.delete(lock_key, version=version)
+        self._flush_stats()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self._cache.has_key(key, version=version):
+            return False
+        self.set(key, value, timeout, version=version)
+        return True
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT,
+                   version=None):
+        value = self.get(key, version=version)
+        if value is None:
+            value = default() if callable(default) else default
+            if value is not None:
+                self.set(key, value, timeout, version=version)
+        return value
+
+    def has_key(self, key, version=None):
+        return self._cache.has_key(key, version=version)
+
+    def delete(self, key, version=None):
+        self._cache.delete(key, version=version)
+        self._cache.delete(self._lock_key(key), version=version)
+
+    def clear(self):
+        with _stats_lock:
+            _stats.pop(self._alias, None)
+        self._cache.clear()
+
+    def stats(self):
+        """Счётчики hit/miss/stale с момента последней очистки кеша.
+
+        Перенесённые в кеш всеми процессами и ещё не перенесённые
+        счётчики этого процесса.
+        """
+        values = self._cache.get_many([f'swr:{stat}' for stat in STATS])
+        with _stats_lock:
+            local = _stats.get(self._alias, {})
+            return {
+                stat: values.get(f'swr:{stat}', 0) + local.get(stat, 0)
+                for stat in STATS
+            }
+
+
+class SQLiteCache(BaseCache):
+    # время последнего чтения обновляется не чаще, чем раз в столько
+    # секунд: иначе каждое чтение превращалось бы в запись
+    ACCESS_GRANULARITY = 1
+    # размер проверяется раз в столько записей в каждом потоке
+    CULL_EVERY = 100
+
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS cache ('
+        'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, '
+        'accessed REAL NOT NULL, size INTEGER NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    ]
+    CULL_SQL = (
+        'DELETE FROM cache WHERE key IN ('
+        'SELECT key FROM (SELECT key, '
+        'row_number() OVER recent AS position, '
+        'sum(size) OVER recent AS kept FROM cache '
+        'WINDOW recent AS (ORDER BY accessed DESC)) '
+        'WHERE position > ? OR kept > ?)'
+    )
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_size = options.get('MAX_SIZE', 64 * 1024 * 1024)
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if getattr(self._local, 'pid', None) != os.getpid():
+            # соединение, унаследованное через fork, использовать нельзя
+            db = None
+        if db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None,
+                check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.SCHEMA:
+                db.execute(statement)
+            self._local.db = db
+            self._local.pid = os.getpid()
+            self._local.writes = 0
+        return db
+
+    def _row(self, key, value, timeout):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        return (key, data, expires, time.time(), len(data))
+
+    def _written(self):
+        self._local.writes += 1
+        if self._local.writes % self.CULL_EVERY == 0:
+            self.cull()
+
+    def cull(self):
+        """Удаляет просроченные записи и вытесняет лишние по LRU."""
+        db = self._db
+        db.execute('DELETE FROM cache WHERE expires <= ?', [time.time()])
+        db.execute(self.CULL_SQL, [self._max_entries, self.max_size])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        # занять можно только свободный или просроченный ключ
+        cursor = self._db.execute(
+            'INSERT INTO cache VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires, accessed = excluded.accessed, '
+            'size = excluded.size WHERE cache.expires <= ?',
+            [*self._row(key, value, timeout), time.time()])
+        self._written()
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        row = self._db.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            [key]).fetchone()
+        if row is None:
+            return default
+        data, expires, accessed = row
+        if expires is not None and expires <= now:
+            return default
+        if now - accessed > self.ACCESS_GRANULARITY:
+            self._db.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', [now, key])
+        return pickle.loads(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._db.execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+            self._row(key, value, timeout))
+        self._written()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [self.get_backend_timeout(timeout), key, time.time()])
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._db.execute('DELETE FROM cache WHERE key = ?', [key])
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [key, time.time()]).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        db = self._db
+        # чтение и запись в одной транзакции: инкремент атомарен
+        # и между процессами
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [key, time.time()]).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                [data, len(data), key])
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return value
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # соединения живут в своих потоках до конца процесса
+        pass
+
+    def disconnect(self):
+        """Закрывает соединение потока, например перед fork."""
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
@@ -0,0 +1,61 @@
+"""Поколение лент и общий кеш пересчитываемых значений.
+
+Номер поколения лент увеличивается при любом изменении постов, групп
+и комментариев. Он входит в ключи страниц лент, закешированных целиком
+(posts/page_cache.py), и в ETag условных GET-запросов
+(posts/conditional.py): после изменения старые страницы просто
+перестают запрашиваться и вытесняются по таймауту, а клиенты получают
+новый ETag.
+
+Значения из cached() и сами страницы лежат в кеше template_fragments,
+который защищает от одновременного пересчёта одного ключа (см.
+posts/cache_backends.py).
+"""
+import time
+
+from django.core.cache import cache, caches
+
+FEED_GENERATION_KEY = 'posts:feed_generation'
+
+
+def _initial_generation():
+    # после вытеснения счётчика нельзя начинать с единицы: под старыми
+    # номерами ещё могут лежать страницы, поэтому стартуем со времени
+    return int(time.time() * 1000)
+
+
+def generation(key):
+    """Текущий номер поколения под ключом key в общем кеше."""
+    number = cache.get(key)
+    if number is None:
+        cache.add(key, _initial_generation(), None)
+        number = cache.get(key)
+    return number
+
+
+def bump_generation(key):
+    """Увеличивает номер поколения и возвращает новый."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_generation(), None)
+        return cache.get(key)
+
+
+def feed_generation():
+    """Текущее поколение лент."""
+    return generation(FEED_GENERATION_KEY)
+
+
+def bump_feed_generation():
+    """Делает недействительными закешированные страницы лент и их ETag."""
+    bump_generation(FEED_GENERATION_KEY)
+
+
+def cached(key, compute, timeout):
+    """Значение из кеша template_fragments; при промахе - compute().
+
+    Пока один запрос пересчитывает устаревшее значение, остальные
+    получают старое.
+    """
+    return caches['template_fragments'].get_or_set(key, compute, timeout)
@@ -0,0 +1,90 @@
+"""Условные GET-запросы к лентам и странице поста.
+
+Страница отдаёт ETag, и повторный запрос с ним получает 304 Not
+Modified без обращения к шаблонам. В ETag входят последнее exch_date
+постов страницы (auto_now, не раньше pub_date) и время последнего
+комментария, поколение лент, пользователь, для которого собрана шапка,
+и то, что зависит от страницы: счётчики автора, подписка.
+
+Last-Modified страница не отдаёт: удаление поста или подписка не
+сдвигают ни одно exch_date, и клиент, который проверяет только
+If-Modified-Since, получил бы 304 на устаревшую страницу. Время
+изменения считается по индексам (exch_date), (author, exch_date) и
+(group, exch_date).
+"""
+import hashlib
+
+from django.db.models import Max
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+from .caching import feed_generation
+from .loaders import loader
+from .models import Comment, Post
+
+
+def current_state(request, page_state, *args, **kwargs):
+    """Результат page_state для запроса; считается один раз."""
+    if not hasattr(request, '_page_state'):
+        request._page_state = page_state(request, *args, **kwargs)
+    return request._page_state
+
+
+def conditional_page(page_state):
+    """condition() для страницы, состояние которой считает page_state.
+
+    page_state(request, **kwargs) возвращает пару (last_modified,
+    version) или None, если страницы нет.
+    """
+    def etag(request, *args, **kwargs):
+        page = current_state(request, page_state, *args, **kwargs)
+        if page is None:
+            return None
+        last_modified, version = page
+        raw = repr((request.user.pk, last_modified, feed_generation(),
+                    version))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def decorator(view):
+        return vary_on_cookie(
+            condition(etag_func=etag)(view))
+    return decorator
+
+
+def _last_change(posts):
+    return posts.aggregate(changed=Max('exch_date'))['changed']
+
+
+def index_state(request):
+    return _last_change(Post.objects.all()), None
+
+
+def group_state(request, slug):
+    group = loader(request).group(slug)
+    if group is None:
+        return None
+    return _last_change(group.posts.all()), (
+        group.title, group.description)
+
+
+def profile_state(request, username):
+    author = loader(request).user(username)
+    if author is None:
+        return None
+    stats = getattr(author, 'stats', None)
+    following = loader(request).is_following(author)
+    return _last_change(author.posts.all()), (
+        stats and stats.followers_count,
+        stats and stats.following_count,
+        following,
+    )
+
+
+def post_state(request, post_id):
+    changed = Post.objects.filter(pk=post_id).values_list(
+        'exch_date', flat=True).first()
+    if changed is None:
+        return None
+    last_comment = Comment.objects.filter(post_id=post_id).aggregate(
+        created=Max('created'))['created']
+    return max(filter(None, [changed, last_comment])), None
@@ -0,0 +1,134 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются одним UPDATE ... SET x = x + 1 в той же транзакции,
+что и сама запись. Если строки счётчиков у автора ещё нет, она
+создаётся пересчётом, так что счётчики сами догоняют старые данные.
+Расхождения исправляет команда manage.py recount_stats.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post
+from .utils import chunks
+
+
+def recount(user):
+    """Пересчитывает и сохраняет счётчики автора (объект или id)."""
+    user_id = getattr(user, 'pk', user)
+    stats, _ = AuthorStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id).count(),
+        },
+    )
+    return stats
+
+
+def _counts(queryset, field, user_ids):
+    # order_by(): сортировка Post по умолчанию попала бы в GROUP BY
+    return dict(queryset.filter(**{f'{field}__in': user_ids}).order_by(
+    ).values(field).annotate(count=Count('pk')).values_list(
+        field, 'count'))
+
+
+def create_missing(user_ids):
+    """Создаёт строки счётчиков, которых нет, тремя запросами на пачку."""
+    posts = _counts(Post.objects, 'author', user_ids)
+    followers = _counts(Follow.objects, 'author', user_ids)
+    following = _counts(Follow.objects, 'user', user_ids)
+    AuthorStats.objects.bulk_create([
+        AuthorStats(
+            user_id=user_id,
+            posts_count=posts.get(user_id, 0),
+            followers_count=followers.get(user_id, 0),
+            following_count=following.get(user_id, 0),
+        )
+        for user_id in user_ids
+    ], ignore_conflicts=True)
+
+
+def recount_authors(user_ids):
+    """Исправляет счётчики многих авторов; возвращает число исправлений.
+
+    На пачку id - три запроса с GROUP BY, чтение строк счётчиков и
+    запись только тех, что разошлись.
+    """
+    fixed = 0
+    for chunk in chunks(user_ids):
+        posts = _counts(Post.objects, 'author', chunk)
+        followers = _counts(Follow.objects, 'author', chunk)
+        following = _counts(Follow.objects, 'user', chunk)
+        stored = AuthorStats.objects.in_bulk(chunk, field_name='user_id')
+        changed, missing = [], []
+        for user_id in chunk:
+            actual = AuthorStats(
+                user_id=user_id,
+                posts_count=posts.get(user_id, 0),
+                followers_count=followers.get(user_id, 0),
+                following_count=following.get(user_id, 0),
+            )
+            stats = stored.get(user_id)
+            if stats is None:
+                missing.append(actual)
+            elif (stats.posts_count, stats.followers_count,
+                  stats.following_count) != (
+                    actual.posts_count, actual.followers_count,
+                    actual.following_count):
+                actual.pk = stats.pk
+                changed.append(actual)
+        AuthorStats.objects.bulk_create(missing, ignore_conflicts=True)
+        AuthorStats.objects.bulk_update(changed, [
+            'posts_count', 'followers_count', 'following_count'])
+        fixed += len(missing) + len(changed)
+    return fixed
+
+
+def author_stats(user):
+    """Счётчики автора; без запросов, если stats взят select_related."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return recount(user)
+
+
+def bump(user_id, field, delta):
+    updated = AuthorStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta})
+    # при удалении строки может уже не быть: например, удаляется автор
+    if not updated and delta > 0:
+        recount(user_id)
+
+
+def bump_followers(author_ids, delta):
+    """bump() счётчиков подписчиков многих авторов разом."""
+    for chunk in chunks(author_ids):
+        counted = list(AuthorStats.objects.filter(
+            user_id__in=chunk).values_list('user_id', flat=True))
+        AuthorStats.objects.filter(user_id__in=counted).update(
+            followers_count=F('followers_count') + delta)
+        # у новых строк подписки уже посчитаны пересчётом
+        missing = set(chunk) - set(counted)
+        if missing and delta > 0:
+            create_missing(sorted(missing))
+
+
+def bump_comment_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + delta)
+
+
+def recount_comments():
+    """Исправляет comment_count у постов одним UPDATE.
+
+    Возвращает число исправленных постов.
+    """
+    comments = Comment.objects.filter(
+        post=OuterRef('pk'),
+    ).order_by().values('post').annotate(count=Count('pk')).values('count')
+    actual = Coalesce(Subquery(comments), 0)
+    return Post.objects.exclude(
+        comment_count=actual).update(comment_count=actual)
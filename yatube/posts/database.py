@@ -0,0 +1,83 @@
+"""Настройка соединений с SQLite и повтор записей при блокировке.
+
+Каждое новое соединение с файловой базой получает PRAGMA из
+settings.SQLITE_PRAGMAS: WAL (читатели не ждут писателя), synchronous
+NORMAL, mmap и кеш страниц побольше, ожидание занятой базы вместо
+мгновенной ошибки; соединения с репликами - только читающие PRAGMA из
+settings.SQLITE_REPLICA_PRAGMAS. Вместе с CONN_MAX_AGE соединение и
+его настройки живут дольше одного запроса.
+
+Транзакции сразу берут блокировку записи (см. posts/sqlite_backend) и
+ждут её по busy_timeout. Если блокировку так и не дали, запись,
+обёрнутая write_with_retry, откатывает транзакцию и повторяет её с
+экспоненциальной паузой. Блокировка одна на всю базу, поэтому
+транзакцию берут только запросы, которые пишут: atomic_with_retry
+пропускает GET и HEAD без неё.
+"""
+import logging
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+from .routers import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+
+def apply_pragmas(connection):
+    """PRAGMA из настроек для нового соединения с файловой SQLite."""
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return
+    pragmas = settings.SQLITE_PRAGMAS
+    if connection.alias in settings.DATABASE_REPLICAS:
+        pragmas = settings.SQLITE_REPLICA_PRAGMAS
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    return 'locked' in str(error)
+
+
+def write_with_retry(label, write, *args, **kwargs):
+    """write(*args, **kwargs) в транзакции, с повтором при блокировке.
+
+    Внутри внешней транзакции (например, в тестах) повтор невозможен,
+    и write просто выполняется в atomic. label - для журнала.
+    """
+    if connection.in_atomic_block:
+        with transaction.atomic():
+            return write(*args, **kwargs)
+    for attempt in range(settings.SQLITE_WRITE_RETRIES + 1):
+        try:
+            with transaction.atomic():
+                return write(*args, **kwargs)
+        except OperationalError as error:
+            if (not is_locked(error)
+                    or attempt == settings.SQLITE_WRITE_RETRIES):
+                raise
+            delay = settings.SQLITE_RETRY_BACKOFF * 2 ** attempt
+            logger.info('%s: база занята, повтор через %.3f с',
+                        label, delay)
+            # случайная добавка, чтобы повторы не сталкивались снова
+            time.sleep(delay * random.uniform(1, 2))
+
+
+def atomic_with_retry(view):
+    """write_with_retry для пишущих запросов к представлению.
+
+    Запросы с безопасным методом (показ формы) идут без транзакции и
+    не ждут блокировку записи. Представление, которое пишет и на GET,
+    оборачивает запись в write_with_retry само.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        return write_with_retry(
+            request.path, view, request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,315 @@
+"""Граф подписок в памяти процесса.
+
+Для каждого пользователя хранится отсортированный array id авторов,
+на которых он подписан, а фильтр Блума по парам (подписчик, автор)
+без поиска в массиве отвечает «не подписан» - самый частый ответ на
+чужих профилях. Граф загружается одним запросом при первом обращении,
+и дальше проверка подписки и список авторов для ленты обходятся без
+SQL.
+
+Сигналы Follow меняют граф сразу, но внутри транзакции изменение
+видно только её потоку, а в общий граф попадает после коммита (метка
+в on_commit). Если транзакцию или точку сохранения откатили, Django
+выбрасывает метку, а вместе с ней и изменение. После коммита
+изменение записывается в журнал в общем кеше под очередным номером
+поколения графа. Остальные процессы сверяют поколение не чаще раза в
+FOLLOW_GRAPH_SYNC_INTERVAL секунд и применяют пропущенные изменения из
+журнала; граф целиком перечитывается, только если журнал неполон или
+отстали больше чем на CHANGE_LOG_SIZE изменений, и перечитывает его
+один поток процесса. Данные, записанные в обход сигналов, нужно
+сопровождать вызовом changed() или invalidate().
+"""
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .caching import bump_generation, generation
+from .models import Follow
+
+FOLLOW_GRAPH_KEY = 'posts:follow_graph_generation'
+CHANGE_KEY = 'posts:follow_graph_change:{}'
+# на столько изменений процесс догоняет граф по журналу, а не перечитывает
+CHANGE_LOG_SIZE = 1000
+CHANGE_LOG_TIMEOUT = 60 * 60
+# доля ложных «возможно, подписан», которые проверяются по массиву;
+# хешей меньше оптимального: фильтр строится при каждой загрузке графа
+BLOOM_ERROR_RATE = 0.01
+BLOOM_HASHES = 3
+
+
+class BloomFilter:
+    """Фильтр Блума для пар целых чисел."""
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE,
+                 hashes=BLOOM_HASHES):
+        self.capacity = max(capacity, 64)
+        self.hashes = hashes
+        self.size = int(-self.capacity * hashes / math.log(
+            1 - error_rate ** (1 / hashes)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, first, second):
+        # двойное хеширование; hash кортежа чисел не зависит от процесса
+        start = hash((first, second))
+        step = hash((second, first, 1)) | 1
+        size = self.size
+        return [(start + i * step) % size for i in range(self.hashes)]
+
+    def add(self, first, second):
+        bits = self.bits
+        for position in self._positions(first, second):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def update(self, pairs):
+        # то же, что add() в цикле, но без вызовов на каждую пару
+        bits, size, hashes = self.bits, self.size, range(self.hashes)
+        for first, second in pairs:
+            start = hash((first, second))
+            step = hash((second, first, 1)) | 1
+            for i in hashes:
+                position = (start + i * step) % size
+                bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, pair):
+        bits = self.bits
+        for position in self._positions(*pair):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class FollowGraph:
+    """Подписки: id пользователя -> отсортированный array id авторов."""
+
+    def __init__(self, pairs=()):
+        self.following = {}
+        self.edges = 0
+        # пары приходят отсортированными по подписчику и автору
+        for user_id, group in groupby(pairs, itemgetter(0)):
+            authors = array('q', map(itemgetter(1), group))
+            self.following[user_id] = authors
+            self.edges += len(authors)
+        self._build_bloom()
+
+    def _build_bloom(self):
+        # подменяется готовый фильтр: contains() в другом потоке не должен
+        # увидеть пустой
+        bloom = BloomFilter(self.edges * 2)
+        bloom.update(
+            (user_id, author_id)
+            for user_id, authors in list(self.following.items())
+            for author_id in authors)
+        self.bloom = bloom
+
+    def contains(self, user_id, author_id):
+        if (user_id, author_id) not in self.bloom:
+            return False
+        authors = self.following.get(user_id, ())
+        index = bisect_left(authors, author_id)
+        return index < len(authors) and authors[index] == author_id
+
+    def authors(self, user_id):
+        return self.following.get(user_id, array('q'))
+
+    def add(self, user_id, author_id):
+        if self.contains(user_id, author_id):
+            return
+        insort(self.following.setdefault(user_id, array('q')), author_id)
+        self.edges += 1
+        if self.edges > self.bloom.capacity:
+            self._build_bloom()
+        else:
+            self.bloom.add(user_id, author_id)
+
+    def remove(self, user_id, author_id):
+        # в фильтре Блума пара остаётся и проверяется по массиву
+        if not self.contains(user_id, author_id):
+            return
+        authors = self.following[user_id]
+        del authors[bisect_left(authors, author_id)]
+        self.edges -= 1
+
+    def apply(self, added, removed):
+        for user_id, author_id in added:
+            self.add(user_id, author_id)
+        for user_id, author_id in removed:
+            self.remove(user_id, author_id)
+
+
+class _Change:
+    """Изменение графа в транзакции; Django вызывает его после коммита."""
+
+    def __init__(self, added, removed):
+        self.added = set(added)
+        self.removed = set(removed)
+
+    def __call__(self):
+        # пустое изменение - метка графа, загруженного в транзакции
+        if self.added or self.removed:
+            _committed(self)
+
+
+_lock = threading.Lock()
+# граф перечитывает один поток, остальные ждут его
+_load_lock = threading.Lock()
+# checked - когда поколение последний раз сверялось с общим кешем
+_shared = {'graph': None, 'generation': None, 'checked': 0.0}
+# незакоммиченные изменения и граф, загруженный внутри транзакции
+_local = threading.local()
+
+
+def _connection():
+    return connections[DEFAULT_DB_ALIAS]
+
+
+def _pending(marker):
+    """Метка ещё ждёт коммита: транзакцию не откатили и не закончили."""
+    return any(
+        entry[1] is marker for entry in _connection().run_on_commit)
+
+
+def _load():
+    # всегда из основной базы: реплика может отставать
+    pairs = Follow.objects.using(DEFAULT_DB_ALIAS).order_by(
+        'user_id', 'author_id').values_list('user_id', 'author_id')
+    return FollowGraph(pairs.iterator())
+
+
+def _catch_up(graph, known, current):
+    """Применяет изменения known+1..current из журнала, если он полон."""
+    if not 0 < current - known <= CHANGE_LOG_SIZE:
+        return False
+    keys = [CHANGE_KEY.format(number)
+            for number in range(known + 1, current + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return False
+    with _lock:
+        if _shared['graph'] is graph and _shared['generation'] == known:
+            for key in keys:
+                graph.apply(*changes[key])
+            _shared['generation'] = current
+    return True
+
+
+def _shared_graph():
+    """Общий граф процесса, если он не отстал от журнала, или None."""
+    with _lock:
+        graph, known = _shared['graph'], _shared['generation']
+        if graph is None:
+            return None
+        now = time.monotonic()
+        if now - _shared['checked'] < settings.FOLLOW_GRAPH_SYNC_INTERVAL:
+            return graph
+        _shared['checked'] = now
+    current = generation(FOLLOW_GRAPH_KEY)
+    if current == known or _catch_up(graph, known, current):
+        return graph
+    with _lock:
+        if _shared['graph'] is graph:
+            _shared['graph'] = None
+    return None
+
+
+def _reload():
+    with _load_lock:
+        graph = _shared_graph()
+        if graph is not None:
+            # пока ждали, граф перечитал другой поток
+            return graph
+        current = generation(FOLLOW_GRAPH_KEY)
+        graph = _load()
+        with _lock:
+            _shared.update(
+                graph=graph, generation=current, checked=time.monotonic())
+        return graph
+
+
+def _graph():
+    """Граф, который видит текущий поток."""
+    graph = _shared_graph()
+    if graph is not None:
+        return graph
+    if _connection().in_atomic_block:
+        # внутри транзакции видны её незакоммиченные строки: такой граф
+        # живёт, пока жива транзакция, и в общий не попадает
+        snapshot = getattr(_local, 'snapshot', None)
+        if snapshot is not None and _pending(snapshot[0]):
+            return snapshot[1]
+        marker = _Change((), ())
+        _connection().on_commit(marker)
+        _local.snapshot = (marker, _load())
+        return _local.snapshot[1]
+    return _reload()
+
+
+def _changes():
+    """Незакоммиченные изменения потока, от старых к новым."""
+    changes = getattr(_local, 'changes', [])
+    _local.changes = [change for change in changes if _pending(change)]
+    return _local.changes
+
+
+def is_following(user_id, author_id):
+    """Подписан ли пользователь на автора."""
+    pair = (user_id, author_id)
+    for change in reversed(_changes()):
+        if pair in change.added:
+            return True
+        if pair in change.removed:
+            return False
+    return _graph().contains(user_id, author_id)
+
+
+def following(user_id):
+    """Отсортированный список id авторов, на которых подписан user_id."""
+    authors = set(_graph().authors(user_id))
+    for change in _changes():
+        authors |= {author for user, author in change.added
+                    if user == user_id}
+        authors -= {author for user, author in change.removed
+                    if user == user_id}
+    return sorted(authors)
+
+
+def changed(added=(), removed=()):
+    """Отмечает подписки (пары id), добавленные и удалённые в базе."""
+    change = _Change(added, removed)
+    connection = _connection()
+    if connection.in_atomic_block:
+        _changes().append(change)
+    connection.on_commit(change)
+
+
+def _committed(change):
+    added, removed = sorted(change.added), sorted(change.removed)
+    with _lock:
+        graph = _shared['graph']
+        if graph is not None:
+            graph.apply(added, removed)
+    current = bump_generation(FOLLOW_GRAPH_KEY)
+    cache.set(CHANGE_KEY.format(current), (added, removed),
+              CHANGE_LOG_TIMEOUT)
+    with _lock:
+        # граф остаётся актуальным, если между поколениями только мы
+        if (_shared['generation'] is not None
+                and current == _shared['generation'] + 1):
+            _shared['generation'] = current
+    if change in getattr(_local, 'changes', []):
+        _local.changes.remove(change)
+
+
+def invalidate():
+    """Граф перечитается из базы во всех процессах."""
+    with _lock:
+        _shared.update(graph=None, generation=None, checked=0.0)
+    # без записи в журнале остальные процессы не смогут догнать граф
+    bump_generation(FOLLOW_GRAPH_KEY)
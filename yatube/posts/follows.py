@@ -0,0 +1,119 @@
+"""Подписка и отписка на много авторов разом.
+
+Сигналы Follow обновляют счётчики, ленты и граф подписок по одной
+строке. Здесь подписки вставляются и удаляются одним запросом на пачку
+в обход сигналов (повторы вставки отбрасывает ограничение
+unique_follow), а счётчики, ленты и граф подписок обновляются пачками
+в той же транзакции. RETURNING отдаёт авторов, строки которых
+действительно вставлены или удалены: подписку, которую успела создать
+или удалить параллельная транзакция, уже посчитали её сигналы.
+RETURNING есть в SQLite с 3.35, версию проверяет posts/sqlite_backend.
+"""
+import re
+
+from django.db import connection, transaction
+
+from . import counters, follow_graph, timeline
+from .models import Follow, User
+from .utils import IN_LIMIT, chunks
+
+SEPARATORS = re.compile(r'[\s,]+')
+
+INSERT_SQL = '''
+{insert} {follow} (user_id, author_id)
+VALUES {rows}
+{suffix} RETURNING author_id'''
+DELETE_SQL = '''
+DELETE FROM {follow}
+WHERE user_id = %s AND author_id IN ({authors})
+RETURNING author_id'''
+
+
+def split_usernames(text):
+    """Имена из текста через пробелы, запятые или с новой строки."""
+    return [name for name in SEPARATORS.split(text) if name]
+
+
+def _author_ids(usernames):
+    found = {}
+    for chunk in chunks(set(usernames)):
+        found.update(User.objects.filter(
+            username__in=chunk).values_list('username', 'pk'))
+    return found
+
+
+def _followed_ids(user):
+    return set(Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True))
+
+
+def _result(usernames, found, changed):
+    return {
+        'changed': len(changed),
+        'unchanged': len(set(found.values())) - len(changed),
+        'unknown': sorted(set(usernames) - set(found)),
+    }
+
+
+def _returned(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _insert(user_id, author_ids):
+    ops = connection.ops
+    inserted = []
+    # два параметра на строку: пачка вдвое меньше
+    for chunk in chunks(author_ids, IN_LIMIT // 2):
+        sql = INSERT_SQL.format(
+            insert=ops.insert_statement(ignore_conflicts=True),
+            follow=Follow._meta.db_table,
+            rows=', '.join(['(%s, %s)'] * len(chunk)),
+            suffix=ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+        )
+        inserted += _returned(
+            sql, [param for author_id in chunk
+                  for param in (user_id, author_id)])
+    return sorted(inserted)
+
+
+def _delete(user_id, author_ids):
+    deleted = []
+    for chunk in chunks(author_ids):
+        sql = DELETE_SQL.format(
+            follow=Follow._meta.db_table,
+            authors=', '.join(['%s'] * len(chunk)),
+        )
+        deleted += _returned(sql, [user_id, *chunk])
+    return sorted(deleted)
+
+
+@transaction.atomic
+def follow_authors(user, usernames):
+    """Подписывает user на авторов; на себя подписаться нельзя."""
+    found = _author_ids(usernames)
+    new_ids = _insert(user.pk, sorted(
+        set(found.values()) - _followed_ids(user) - {user.pk}))
+    if new_ids:
+        counters.bump(user.pk, 'following_count', len(new_ids))
+        counters.bump_followers(new_ids, 1)
+        timeline.backfill_authors(user.pk, new_ids)
+        follow_graph.changed(
+            added=[(user.pk, author_id) for author_id in new_ids])
+    return _result(usernames, found, new_ids)
+
+
+@transaction.atomic
+def unfollow_authors(user, usernames):
+    """Отписывает user от авторов."""
+    found = _author_ids(usernames)
+    old_ids = _delete(user.pk, sorted(
+        set(found.values()) & _followed_ids(user)))
+    if old_ids:
+        counters.bump(user.pk, 'following_count', -len(old_ids))
+        counters.bump_followers(old_ids, -1)
+        timeline.prune_authors(user.pk, old_ids)
+        follow_graph.changed(
+            removed=[(user.pk, author_id) for author_id in old_ids])
+    return _result(usernames, found, old_ids)
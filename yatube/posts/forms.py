@@ -1,13 +1,26 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
 
+from .images import prepare_image, release_image
 from .models import Comment, Post
 
 
 class PostForm(forms.ModelForm):
+    normalized_image = None
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # файлы, которые пост может перестать использовать при сохранении
+        self.replaced_files = {
+            'image': self.instance.image.name,
+            'image_webp': self.instance.image_webp.name,
+        }
+
     def clean_text(self):
         data = self.cleaned_data['text']
         if data.strip() == '1':
@@ -15,6 +28,48 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError(error_explanation)
         return data
 
+    def clean_image(self):
+        # новые загрузки пересохраняются, уже сохранённые не трогаем
+        data = self.cleaned_data['image']
+        if isinstance(data, UploadedFile):
+            # заголовок ImageField проверил, но файл может оборваться
+            # дальше или разжиматься в слишком большую картинку
+            try:
+                self.normalized_image = prepare_image(data)
+            except (OSError, Image.DecompressionBombError):
+                raise forms.ValidationError(
+                    'Файл повреждён или это слишком большая картинка',
+                    code='invalid_image')
+            return self.normalized_image.image
+        return data
+
+    def save(self, commit=True):
+        post = super().save(commit=False)
+        normalized = self.normalized_image
+        if normalized is not None:
+            post.image_width = normalized.width
+            post.image_height = normalized.height
+            post.image_webp = ''
+            if isinstance(normalized.webp, str):
+                post.image_webp = normalized.webp
+            elif normalized.webp is not None:
+                post.image_webp.save(
+                    normalized.webp.name, normalized.webp, save=False)
+        elif not post.image:
+            post.image_width = post.image_height = None
+            post.image_webp = ''
+        if commit:
+            post.save()
+            self.save_m2m()
+            self.release_replaced_files()
+        return post
+
+    def release_replaced_files(self):
+        """Отпускает файлы, которые пост перестал использовать."""
+        for field_name, name in self.replaced_files.items():
+            if name != getattr(self.instance, field_name).name:
+                release_image(field_name, name)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,358 @@
+"""Быстрое наполнение базы синтетическими данными.
+
+Строки идут из генераторов пачками, поэтому память не растёт с
+объёмом данных: пользователи и посты выбираются по диапазону id, а
+дата поста считается по его номеру. Подписки распределены по
+степенному закону: у немногих авторов тысячи подписчиков, у
+большинства - единицы. Так же, но независимо, распределено, кто
+сколько пишет.
+
+Маленькие таблицы пишутся bulk_create. Посты, комментарии и подписки
+пишутся executemany готовыми значениями колонок: на миллионах строк
+сборка моделей и SQL в bulk_create обходится дороже самой вставки, а
+ленты заполняются одним INSERT ... SELECT. На время вставки на SQLite
+снимаются вторичные индексы и триггеры этих таблиц (см. bulk_load) и
+отключается синхронная запись.
+
+Вставка в обход моделей не шлёт сигналы, поэтому то, что обычно делают
+сигналы, здесь делается явно и целиком: HTML текста собирается при
+генерации, счётчики, ленты подписок и поисковый индекс заполняются
+запросами после вставки.
+"""
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from PIL import Image
+
+from . import follow_graph, search, timeline
+from .caching import bump_feed_generation
+from .models import (AuthorStats, Comment, Follow, Group, Post,
+                     TimelineEntry, User)
+from .rendering import RENDERER_VERSION, render_text
+
+IMAGES = 5
+IMAGE_SIZE = (640, 480)
+# абзацы текста постов и комментариев берутся из готового набора
+PARAGRAPHS = 2000
+
+WORDS = (
+    'день вечер утро город дорога море лес река книга письмо друг '
+    'дом окно сад кот собака поезд осень зима весна лето дождь снег '
+    'солнце ветер музыка кофе работа отпуск фото прогулка история '
+    'новый старый тихий яркий долгий быстрый тёплый холодный'
+).split()
+
+POST_FIELDS = (
+    'author', 'group', 'text', 'text_html', 'text_html_version',
+    'pub_date', 'exch_date', 'image', 'image_webp', 'image_width',
+    'image_height', 'comment_count',
+)
+COMMENT_FIELDS = ('post', 'author', 'text', 'created')
+FOLLOW_FIELDS = ('user', 'author')
+
+
+def placeholder_images(rng, prefix='generated'):
+    """Несколько картинок-заглушек; посты делят их, как дубликаты."""
+    names = []
+    for i in range(IMAGES):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        buffer = BytesIO()
+        Image.new('RGB', IMAGE_SIZE, color).save(buffer, 'JPEG')
+        names.append(default_storage.save(
+            f'posts/{prefix}-{i}.jpg', ContentFile(buffer.getvalue())))
+    return names
+
+
+def power_law_weights(count, exponent):
+    """Накопленные веса закона Ципфа для rng.choices(cum_weights=...)."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choices(WORDS, k=words)).capitalize() + '.'
+
+
+@contextmanager
+def bulk_load(*models):
+    """Снимает на время вставки вторичные индексы и триггеры таблиц.
+
+    Индексы потом строятся заново одним проходом, что быстрее, чем
+    поддерживать их на каждой строке. Уникальные ограничения остаются.
+    На других СУБД ничего не делает.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name, sql FROM sqlite_master "
+            "WHERE type IN ('index', 'trigger') AND sql IS NOT NULL "
+            f"AND tbl_name IN ({', '.join(['%s'] * len(tables))})",
+            tables)
+        # триггеры - после индексов: они могут на них рассчитывать
+        saved = sorted(cursor.fetchall(), key=lambda row: row[0] != 'index')
+        # внутри транзакции (например, в тестах) режим записи не меняется
+        synchronous = None
+        if not connection.in_atomic_block:
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+            cursor.execute('PRAGMA synchronous = OFF')
+        for kind, name, _ in saved:
+            cursor.execute(f'DROP {kind.upper()} "{name}"')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, _, sql in saved:
+                cursor.execute(sql)
+            if synchronous is not None:
+                cursor.execute(f'PRAGMA synchronous = {synchronous}')
+
+
+def insert(model, objects, batch_size):
+    """Пишет модели из генератора bulk_create транзакциями."""
+    total = 0
+    objects = iter(objects)
+    while True:
+        batch = list(itertools.islice(objects, batch_size))
+        if not batch:
+            return total
+        # на запросы пачку делит сам bulk_create: у SQLite лимит
+        # на число параметров запроса
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        total += len(batch)
+
+
+def insert_rows(model, fields, rows, batch_size, ignore_conflicts=False):
+    """Пишет кортежи значений колонок executemany транзакциями.
+
+    Значения должны быть уже в виде для базы: id связей, даты как
+    после adapt_datetimefield_value. Возвращает число переданных строк.
+    """
+    ops = connection.ops
+    columns = ', '.join(
+        ops.quote_name(model._meta.get_field(name).column)
+        for name in fields)
+    sql = (
+        f'{ops.insert_statement(ignore_conflicts=ignore_conflicts)} '
+        f'{ops.quote_name(model._meta.db_table)} ({columns}) '
+        f'VALUES ({", ".join(["%s"] * len(fields))}) '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts)}'
+    )
+    total = 0
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return total
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+        total += len(batch)
+
+
+class Generator:
+    """Синтетические данные одного прогона; seed задаёт их полностью.
+
+    Имена пользователей и слаги групп начинаются с prefix, так что
+    прогоны с разными префиксами не пересекаются.
+    """
+    def __init__(self, prefix='user', seed=0, users=1000, groups=20,
+                 posts=100_000, comments=200_000, follows=50_000,
+                 image_share=0.0, exponent=1.1, days=365,
+                 batch_size=10_000):
+        self.prefix = prefix
+        self.seed = seed
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.comments = comments
+        self.follows = follows
+        self.image_share = image_share
+        self.exponent = exponent
+        self.batch_size = batch_size
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=days)
+        # пост с номером i опубликован в start + i * step
+        self.step = (self.now - self.start) / max(posts, 1)
+
+    def rng(self, stage):
+        # у каждого этапа свой поток случайных чисел: этапы не влияют
+        # друг на друга, например при смене числа постов
+        return random.Random(f'{self.seed}:{stage}')
+
+    def run(self):
+        """Пишет все данные и возвращает число строк по таблицам."""
+        self.prepare()
+        last_user = User.objects.aggregate(last=Max('pk'))['last'] or 0
+        last_post = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        created = {
+            'users': insert(User, self.user_rows(), self.batch_size),
+            'groups': insert(Group, self.group_rows(), self.batch_size),
+        }
+        self.first_user, self.last_user = self._id_range(
+            User.objects.filter(pk__gt=last_user))
+        self.group_ids = list(Group.objects.filter(
+            slug__startswith=f'{self.prefix}-').values_list('pk', flat=True))
+        with bulk_load(Post, Comment, Follow):
+            created['posts'] = insert_rows(
+                Post, POST_FIELDS, self.post_rows(), self.batch_size)
+            self.first_post, self.last_post = self._id_range(
+                Post.objects.filter(pk__gt=last_post))
+            created['comments'] = insert_rows(
+                Comment, COMMENT_FIELDS, self.comment_rows(),
+                self.batch_size)
+            # повторные пары отбрасывает уникальное ограничение
+            insert_rows(Follow, FOLLOW_FIELDS, self.follow_rows(),
+                        self.batch_size, ignore_conflicts=True)
+        created['follows'] = Follow.objects.filter(
+            **self.user_range('author')).count()
+        created['author_stats'] = self.fill_counters()
+        with bulk_load(TimelineEntry):
+            created['timeline_entries'] = timeline.fan_out_authors(
+                self.first_user, self.last_user)
+        if self.first_post is not None:
+            search.index_posts(self.first_post)
+        bump_feed_generation()
+        follow_graph.invalidate()
+        return created
+
+    def prepare(self):
+        rng = self.rng('prepare')
+        # дальше даты считаются от начала в том виде, в котором их
+        # хранит база: без перевода часового пояса на каждой строке
+        self.db_start = datetime.fromisoformat(str(
+            connection.ops.adapt_datetimefield_value(self.start)))
+        # популярность (подписчики) и плодовитость (посты) - разные
+        # авторы, иначе ленты подписок разрастаются на порядки
+        self.weights = power_law_weights(self.users, self.exponent)
+        self.prolific = list(range(self.users))
+        rng.shuffle(self.prolific)
+        self.paragraphs = []
+        for _ in range(PARAGRAPHS):
+            text = ' '.join(
+                _sentence(rng, rng.randint(4, 12))
+                for _ in range(rng.randint(1, 3)))
+            self.paragraphs.append((text, render_text(text)))
+
+    def _id_range(self, queryset):
+        ids = queryset.order_by('pk').values_list('pk', flat=True)
+        return ids.first(), ids.last()
+
+    def user_range(self, field):
+        # у связей в Django 2.2 нет lookup range
+        return {f'{field}__gte': self.first_user,
+                f'{field}__lte': self.last_user}
+
+    def author_index(self, rng):
+        """Номер автора по степенному закону: первые популярнее."""
+        return rng.choices(range(self.users), cum_weights=self.weights)[0]
+
+    def date(self, offset):
+        """Дата через offset после начала, в виде для базы."""
+        return str(self.db_start + offset)
+
+    def user_rows(self):
+        # пароль один на всех: хеширование на каждого заняло бы часы
+        password = make_password(self.prefix)
+        for i in range(self.users):
+            yield User(username=f'{self.prefix}-{i}', password=password,
+                       date_joined=self.start)
+
+    def group_rows(self):
+        rng = self.rng('groups')
+        for i in range(self.groups):
+            yield Group(
+                title=f'Группа {i}', slug=f'{self.prefix}-{i}',
+                description=_sentence(rng, 12))
+
+    def post_rows(self):
+        rng = self.rng('posts')
+        images = (
+            placeholder_images(rng, self.prefix) if self.image_share else [])
+        for i in range(self.posts):
+            paragraphs = rng.choices(self.paragraphs, k=rng.randint(1, 3))
+            # linebreaks рендерит абзацы независимо друг от друга
+            text = '\n\n'.join(text for text, _ in paragraphs)
+            text_html = '\n\n'.join(html for _, html in paragraphs)
+            group_id = (
+                rng.choice(self.group_ids)
+                if self.group_ids and rng.random() < 0.5 else None)
+            image, size = '', (None, None)
+            if images and rng.random() < self.image_share:
+                image, size = rng.choice(images), IMAGE_SIZE
+            pub_date = self.date(self.step * i)
+            yield (
+                self.first_user + self.prolific[self.author_index(rng)],
+                group_id, text, text_html, RENDERER_VERSION,
+                pub_date, pub_date, image, '', *size, 0,
+            )
+
+    def comment_rows(self):
+        if self.first_post is None:
+            return
+        rng = self.rng('comments')
+        for _ in range(self.comments):
+            post_id = rng.randint(self.first_post, self.last_post)
+            created = min(
+                self.step * (post_id - self.first_post)
+                + timedelta(minutes=rng.randint(1, 60 * 24)),
+                self.now - self.start)
+            yield (
+                post_id, self.first_user + rng.randrange(self.users),
+                rng.choice(self.paragraphs)[0], self.date(created),
+            )
+
+    def follow_rows(self):
+        rng = self.rng('follows')
+        for _ in range(self.follows):
+            user_id = self.first_user + rng.randrange(self.users)
+            author_id = self.first_user + self.author_index(rng)
+            if user_id != author_id:
+                yield user_id, author_id
+
+    def fill_counters(self):
+        """Счётчики авторов и комментариев по вставленным строкам."""
+        # order_by(): сортировка Post по умолчанию попала бы в GROUP BY
+        posts = dict(Post.objects.filter(
+            **self.user_range('author')).order_by().values(
+            'author').annotate(count=Count('pk')).values_list(
+            'author', 'count'))
+        followers = dict(Follow.objects.filter(
+            **self.user_range('author')).values(
+            'author').annotate(count=Count('pk')).values_list(
+            'author', 'count'))
+        following = dict(Follow.objects.filter(
+            **self.user_range('user')).values(
+            'user').annotate(count=Count('pk')).values_list(
+            'user', 'count'))
+        created = insert(AuthorStats, (
+            AuthorStats(
+                user_id=user_id,
+                posts_count=posts.get(user_id, 0),
+                followers_count=followers.get(user_id, 0),
+                following_count=following.get(user_id, 0),
+            )
+            for user_id in range(self.first_user, self.last_user + 1)
+        ), self.batch_size)
+        if self.first_post is not None:
+            comments = Comment.objects.filter(
+                post=OuterRef('pk'),
+            ).order_by().values('post').annotate(
+                count=Count('pk')).values('count')
+            Post.objects.filter(
+                pk__gte=self.first_post, pk__lte=self.last_post,
+            ).update(comment_count=Coalesce(Subquery(comments), 0))
+        return created
@@ -0,0 +1,126 @@
+"""Нормализация и дедупликация картинок постов при загрузке.
+
+Картинка уменьшается до settings.IMAGE_MAX_SIZE по большей стороне,
+поворачивается по EXIF и пересохраняется без метаданных как
+прогрессивный JPEG. Если Pillow собран с поддержкой WebP, рядом
+сохраняется WebP-вариант.
+
+Имя файла - sha256 исходной загрузки, который считается по кускам
+при чтении. Одинаковые картинки получают одно имя, поэтому делят
+один файл и один набор миниатюр sorl, а повторная загрузка вообще
+не декодируется. Файл удаляется, когда на него не ссылается ни один
+пост.
+
+Проверка «файла ещё нет» в prepare_image и «на файл никто не
+ссылается» в release_image идут под одной блокировкой записи SQLite
+(BEGIN IMMEDIATE, см. posts/sqlite_backend): prepare_image вызывается
+в пишущей транзакции представления, а удаление сиротского файла берёт
+свою. Поэтому файл не удаляется между тем, как новый пост решил его
+переиспользовать, и тем, как этот пост записан.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, features
+from sorl.thumbnail import delete as delete_with_thumbnails
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+class NormalizedImage:
+    """Картинка и WebP-вариант: новые файлы или имена уже сохранённых."""
+    def __init__(self, image, webp, width, height):
+        self.image = image
+        self.webp = webp
+        self.width = width
+        self.height = height
+
+
+def content_digest(uploaded):
+    """sha256 загруженного файла, не читая его в память целиком."""
+    digest = hashlib.sha256()
+    for chunk in uploaded.chunks():
+        digest.update(chunk)
+    uploaded.seek(0)
+    return digest.hexdigest()
+
+
+def _flatten(image):
+    """Переводит картинку в RGB, подкладывая белый фон под прозрачность."""
+    if image.mode in ('RGBA', 'LA') or (
+            image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def normalize_image(uploaded, stem):
+    """Пересохраняет загрузку; файлы называются stem.jpg и stem.webp."""
+    uploaded.seek(0)
+    with Image.open(uploaded) as source:
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((settings.IMAGE_MAX_SIZE, settings.IMAGE_MAX_SIZE))
+        image = _flatten(image)
+    # метаданные не переносятся: exif в save не передаётся
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=settings.IMAGE_QUALITY,
+               optimize=True, progressive=True)
+    jpeg = ContentFile(buffer.getvalue(), name=f'{stem}.jpg')
+    webp = None
+    if features.check('webp'):
+        buffer = BytesIO()
+        image.save(buffer, 'WEBP', quality=settings.IMAGE_QUALITY)
+        webp = ContentFile(buffer.getvalue(), name=f'{stem}.webp')
+    return NormalizedImage(jpeg, webp, *image.size)
+
+
+def prepare_image(uploaded):
+    """NormalizedImage для загрузки, с переиспользованием такой же.
+
+    Вызывать в той же транзакции, что сохраняет пост.
+    """
+    digest = content_digest(uploaded)
+    name = Post._meta.get_field('image').generate_filename(
+        None, f'{digest}.jpg')
+    if not default_storage.exists(name):
+        return normalize_image(uploaded, digest)
+    webp = Post._meta.get_field('image_webp').generate_filename(
+        None, f'{digest}.webp')
+    if not default_storage.exists(webp):
+        webp = None
+    stored = Post.objects.filter(image=name).values_list(
+        'image_width', 'image_height').first()
+    if stored is None:
+        # файл пережил откат транзакции: размеры берём из заголовка
+        with default_storage.open(name) as image_file:
+            stored = get_image_dimensions(image_file)
+    return NormalizedImage(name, webp, *stored)
+
+
+def release_image(field_name, name):
+    """Удаляет файл после коммита, если на него не ссылается ни один пост."""
+    if not name:
+        return
+
+    def delete_orphan():
+        # блокировка записи держится, пока файл не удалён
+        with transaction.atomic():
+            if Post.objects.filter(**{field_name: name}).exists():
+                return
+            try:
+                delete_with_thumbnails(name)
+            except (SuspiciousFileOperation, OSError):
+                logger.exception('Не удалось удалить картинку %s', name)
+
+    transaction.on_commit(delete_orphan)
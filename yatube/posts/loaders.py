@@ -0,0 +1,63 @@
+"""Пользователи и группы, загруженные за запрос (identity map).
+
+Страница профиля спрашивает автора и в состоянии для условного GET, и
+в самом представлении, и во фрагменте кнопки подписки; ленты группы -
+группу. RequestLoader запоминает загруженные объекты (и их отсутствие)
+на время запроса, так что каждый читается из базы не больше одного
+раза, а вошедший пользователь берётся из request.user, который уже
+загрузил AuthenticationMiddleware. Подписки проверяются по графу в
+памяти, см. posts/follow_graph.py.
+"""
+from django.http import Http404
+
+from . import follow_graph
+from .models import Group, User
+
+
+class RequestLoader:
+    def __init__(self, request):
+        self.request = request
+        self._users = {}
+        self._groups = {}
+
+    def user(self, username):
+        """Пользователь со счётчиками или None."""
+        current = self.request.user
+        if current.is_authenticated and current.username == username:
+            return current
+        if username not in self._users:
+            self._users[username] = User.objects.select_related(
+                'stats').filter(username=username).first()
+        return self._users[username]
+
+    def group(self, slug):
+        if slug not in self._groups:
+            self._groups[slug] = Group.objects.filter(slug=slug).first()
+        return self._groups[slug]
+
+    def is_following(self, author):
+        """Подписан ли вошедший пользователь на автора."""
+        current = self.request.user
+        return current.is_authenticated and follow_graph.is_following(
+            current.pk, author.pk)
+
+
+def loader(request):
+    """RequestLoader запроса; создаётся при первом обращении."""
+    if not hasattr(request, '_loader'):
+        request._loader = RequestLoader(request)
+    return request._loader
+
+
+def get_user_or_404(request, username):
+    user = loader(request).user(username)
+    if user is None:
+        raise Http404('Нет такого пользователя')
+    return user
+
+
+def get_group_or_404(request, slug):
+    group = loader(request).group(slug)
+    if group is None:
+        raise Http404('Нет такой группы')
+    return group
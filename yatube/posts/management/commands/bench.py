@@ -0,0 +1,155 @@
+import json
+import os
+import random
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts.benchmark import build_dataset, run_mix, run_scenario
+from posts.models import Group, Post, User
+
+
+def scenarios(rng):
+    """Имя страницы -> (запрос, нужен ли вошедший пользователь)."""
+    posts = list(Post.objects.values_list('pk', flat=True))
+    slugs = list(Group.objects.values_list('slug', flat=True))
+    usernames = list(User.objects.values_list('username', flat=True))
+
+    def get(address_for):
+        return lambda client, i: client.get(address_for(i))
+
+    # страницы без данных для запроса (например, --groups 0) пропускаются
+    pages = {
+        'index': (get(lambda i: reverse('post:index')), False),
+        'group_posts': slugs and (get(lambda i: reverse(
+            'post:group_list', kwargs={'slug': rng.choice(slugs)})), False),
+        'profile': usernames and (get(lambda i: reverse(
+            'post:profile',
+            kwargs={'username': rng.choice(usernames)})), False),
+        'post_detail': posts and (get(lambda i: reverse(
+            'post:post_detail',
+            kwargs={'post_id': rng.choice(posts)})), False),
+        'follow_index': (get(lambda i: reverse('post:follow_index')), True),
+        'post_create': (lambda client, i: client.post(
+            reverse('post:post_create'),
+            {'text': f'Пост из нагрузочного прогона {i}'}), True),
+    }
+    return {name: page for name, page in pages.items() if page}
+
+
+def mixed(rng):
+    """Чтение ленты одновременно с записью комментариев; None без постов."""
+    posts = list(Post.objects.values_list('pk', flat=True))
+    if not posts:
+        return None
+    return (
+        lambda client, i: client.get(reverse('post:index')),
+        lambda client, i: client.post(
+            reverse('post:add_comment',
+                    kwargs={'post_id': rng.choice(posts)}),
+            {'text': f'Комментарий из нагрузочного прогона {i}'}),
+    )
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон страниц на синтетических данных во '
+            'временной базе; результат - JSON для сравнения прогонов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--comments', type=int, default=1000)
+        parser.add_argument('--follows', type=int, default=200)
+        parser.add_argument('--image-share', type=float, default=0.2,
+                            help='Доля постов с картинками')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на страницу')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Потоков, которые шлют запросы')
+        parser.add_argument('--writers', type=int, default=2,
+                            help='Потоков, пишущих комментарии во время '
+                                 'чтения ленты')
+        parser.add_argument('--no-sqlite-tuning', action='store_true',
+                            help='Без PRAGMA, повторов записи и '
+                                 'постоянных соединений - для сравнения')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для JSON-отчёта')
+
+    def check_options(self, options):
+        counts = ('users', 'groups', 'posts', 'comments', 'follows',
+                  'requests', 'writers')
+        for name in counts:
+            if options[name] < 0:
+                raise CommandError(f'--{name} не может быть меньше нуля')
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency должен быть не меньше 1')
+        if not 0 <= options['image_share'] <= 1:
+            raise CommandError('--image-share - доля от 0 до 1')
+        if options['users'] < 1 and (options['posts'] or options['comments']):
+            raise CommandError('Для постов и комментариев нужен хотя бы '
+                               'один пользователь (--users)')
+        if options['posts'] < 1 and options['comments']:
+            raise CommandError('Для комментариев нужен хотя бы один пост '
+                               '(--posts)')
+
+    def handle(self, *args, **options):
+        self.check_options(options)
+        tuning = {}
+        if options['no_sqlite_tuning']:
+            tuning = {'SQLITE_PRAGMAS': {}, 'SQLITE_WRITE_RETRIES': 0}
+            # словарь общий для соединений всех потоков
+            connection.settings_dict['CONN_MAX_AGE'] = 0
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            # миниатюры строятся сразу: фоновые записи в файловую
+            # SQLite мешали бы наполнению базы
+            DEBUG=False, THUMBNAIL_ASYNC=False,
+            MEDIA_ROOT=os.path.join(directory, 'media'), **tuning,
+        ):
+            test_settings = connection.settings_dict.setdefault('TEST', {})
+            test_settings['NAME'] = os.path.join(directory, 'bench.sqlite3')
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False)
+            try:
+                report = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+        self.stdout.write(output)
+
+    def run(self, options):
+        dataset = build_dataset(
+            options['users'], options['groups'], options['posts'],
+            options['comments'], options['follows'], options['image_share'],
+            options['seed'])
+        rng = random.Random(options['seed'])
+        # читает ленту тот, у кого больше всего подписок
+        reader = User.objects.order_by('-stats__following_count').first()
+        results = {}
+        for name, (request, logged_in) in scenarios(rng).items():
+            results[name] = run_scenario(
+                request, options['requests'], options['concurrency'],
+                user=reader if logged_in else None)
+        mix = mixed(rng)
+        if mix is not None:
+            read, write = mix
+            results['index_with_comments'] = run_mix({
+                'index': (read, options['concurrency'], None),
+                'add_comment': (write, options['writers'], reader),
+            }, options['requests'])
+        return {
+            'dataset': dataset,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'database': settings.DATABASES['default']['ENGINE'],
+            'sqlite_tuning': not options['no_sqlite_tuning'],
+            'scenarios': results,
+        }
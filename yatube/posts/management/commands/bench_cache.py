@@ -0,0 +1,88 @@
+import os
+import statistics
+import tempfile
+import time
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts.cache_backends import SQLiteCache
+from posts.models import User
+
+
+def backends(directory):
+    return {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(directory, 'file'),
+        },
+        'sqlite': {
+            **settings.CACHE_BACKENDS['sqlite'],
+            'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+        },
+    }
+
+
+def run_worker(addresses, requests):
+    """Времена ответов одного процесса в миллисекундах."""
+    # адрес не из INTERNAL_IPS: debug toolbar не встраивается в ответы
+    client = Client(REMOTE_ADDR='10.0.0.1')
+    timings = []
+    for i in range(requests):
+        started = time.perf_counter()
+        client.get(addresses[i % len(addresses)])
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает бэкенды кеша на главной странице и странице '
+            'профиля при нескольких процессах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на процесс')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Число процессов, как у gunicorn')
+
+    def handle(self, *args, **options):
+        author = User.objects.order_by('-stats__posts_count').first()
+        if author is None:
+            raise CommandError('В базе нет пользователей и постов')
+        addresses = [
+            reverse('post:index'),
+            reverse('post:profile', kwargs={'username': author.username}),
+        ]
+        context = get_context('fork')
+        with tempfile.TemporaryDirectory() as directory:
+            for name, backend in backends(directory).items():
+                with override_settings(CACHES={
+                    **settings.CACHES, 'default': backend,
+                }):
+                    caches['default'].clear()
+                    # дочерние процессы открывают свои соединения:
+                    # соединения SQLite нельзя передавать через fork
+                    connections.close_all()
+                    for cache in caches.all():
+                        if isinstance(cache, SQLiteCache):
+                            cache.disconnect()
+                    started = time.perf_counter()
+                    with context.Pool(options['workers']) as pool:
+                        results = pool.starmap(run_worker, [
+                            (addresses, options['requests'])
+                        ] * options['workers'])
+                    elapsed = time.perf_counter() - started
+                timings = sorted(sum(results, []))
+                self.stdout.write(
+                    f'{name:8} {len(timings) / elapsed:8.1f} запр/с  '
+                    f'p50 {statistics.median(timings):6.1f} мс  '
+                    f'p95 {timings[int(len(timings) * 0.95)]:6.1f} мс')
@@ -0,0 +1,71 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PROFILES = {
+    'dev': {'YATUBE_PRODUCTION': 'False'},
+    'prod': {'YATUBE_PRODUCTION': 'True'},
+}
+
+# выполняется в отдельном процессе: настройки читаются при запуске
+SCRIPT = '''
+import json, sys, time
+
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter() - started
+
+from django.test import Client
+
+client = Client()
+address, requests = sys.argv[1], int(sys.argv[2])
+started = time.perf_counter()
+status = client.get(address).status_code
+first = time.perf_counter() - started
+started = time.perf_counter()
+for _ in range(requests):
+    client.get(address)
+per_request = (time.perf_counter() - started) / requests
+print(json.dumps({
+    'status': status, 'setup': setup, 'first': first,
+    'per_request': per_request,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает профили настроек dev и prod: время запуска '
+            'и накладные расходы на запрос')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', default='/',
+                            help='Адрес страницы для замера')
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Запросов после первого')
+
+    def handle(self, *args, **options):
+        for name, profile in PROFILES.items():
+            env = {
+                **os.environ,
+                **profile,
+                'DJANGO_SETTINGS_MODULE': 'yatube.settings',
+            }
+            process = subprocess.run(
+                [sys.executable, '-c', SCRIPT,
+                 options['address'], str(options['requests'])],
+                cwd=settings.BASE_DIR, env=env,
+                capture_output=True, text=True)
+            if process.returncode != 0:
+                raise CommandError(
+                    f'Профиль {name} не запустился:\n{process.stderr}')
+            result = json.loads(process.stdout.splitlines()[-1])
+            self.stdout.write(
+                f"{name:5} запуск {result['setup'] * 1000:7.1f} мс  "
+                f"первый запрос {result['first'] * 1000:7.1f} мс  "
+                f"запрос {result['per_request'] * 1000:6.2f} мс  "
+                f"(HTTP {result['status']})")
@@ -0,0 +1,14 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания, промахи и устаревшие выдачи кеша фрагментов'
+
+    def handle(self, *args, **options):
+        stats = caches['template_fragments'].stats()
+        total = sum(stats.values())
+        ratio = stats['hit'] / total if total else 0
+        self.stdout.write(
+            f"hit {stats['hit']}, miss {stats['miss']}, "
+            f"stale {stats['stale']}, доля попаданий {ratio:.1%}")
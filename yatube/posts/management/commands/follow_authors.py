@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.follows import follow_authors, split_usernames, unfollow_authors
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Подписывает пользователя на многих авторов разом, например '
+            'по импортированному списку')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Кого подписывать')
+        parser.add_argument('authors', nargs='*',
+                            help='Имена авторов')
+        parser.add_argument('--file',
+                            help='Файл с именами авторов; - для stdin')
+        parser.add_argument('--unfollow', action='store_true',
+                            help='Отписать вместо подписки')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(
+                f'Нет пользователя {options["username"]}')
+        usernames = list(options['authors'])
+        if options['file'] == '-':
+            usernames += split_usernames(sys.stdin.read())
+        elif options['file']:
+            with open(options['file'], encoding='utf-8') as names:
+                usernames += split_usernames(names.read())
+        if not usernames:
+            raise CommandError('Укажите авторов или --file')
+        if options['unfollow']:
+            result = unfollow_authors(user, usernames)
+            done = 'Отписан от'
+        else:
+            result = follow_authors(user, usernames)
+            done = 'Подписан на'
+        if result['unknown']:
+            self.stderr.write(
+                'Нет таких авторов: ' + ', '.join(result['unknown']))
+        self.stdout.write(self.style.SUCCESS(
+            f'{done} {result["changed"]} авторов, без изменений '
+            f'{result["unchanged"]}'))
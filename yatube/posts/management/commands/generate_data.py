@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.generator import Generator
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = ('Быстро наполняет базу синтетическими пользователями, '
+            'группами, постами, комментариями и подписками')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='user',
+                            help='Начало имён пользователей и групп')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--comments', type=int, default=200_000)
+        parser.add_argument('--follows', type=int, default=50_000,
+                            help='Попыток подписки; повторы отбрасываются')
+        parser.add_argument('--image-share', type=float, default=0.0,
+                            help='Доля постов с картинками-заглушками')
+        parser.add_argument('--exponent', type=float, default=1.1,
+                            help='Показатель степенного закона подписок')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределены посты')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя')
+        if (User.objects.filter(username__startswith=f'{prefix}-').exists()
+                or Group.objects.filter(slug__startswith=f'{prefix}-')
+                .exists()):
+            raise CommandError(
+                f'Данные с префиксом {prefix} уже есть, выберите другой '
+                '--prefix')
+        generator = Generator(
+            prefix=prefix, seed=options['seed'], users=options['users'],
+            groups=options['groups'], posts=options['posts'],
+            comments=options['comments'], follows=options['follows'],
+            image_share=options['image_share'],
+            exponent=options['exponent'], days=options['days'],
+            batch_size=options['batch_size'])
+        started = time.perf_counter()
+        created = generator.run()
+        elapsed = time.perf_counter() - started
+        rows = sum(created.values())
+        self.stdout.write(', '.join(
+            f'{table} {count}' for table, count in created.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано строк: {rows} за {elapsed:.1f} с '
+            f'({rows / elapsed:.0f} строк/с)'))
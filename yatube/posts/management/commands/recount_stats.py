@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_authors, recount_comments
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики авторов и постов'
+
+    def handle(self, *args, **options):
+        fixed_authors = recount_authors(
+            User.objects.values_list('pk', flat=True).iterator())
+        fixed_posts = recount_comments()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: авторов {fixed_authors}, '
+            f'постов {fixed_posts}'))
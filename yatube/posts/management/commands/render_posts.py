@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.caching import bump_feed_generation
+from posts.models import Post
+from posts.rendering import RENDERER_VERSION, render_text
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает HTML текста постов, собранный старой версией '
+            'рендерера')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересобрать HTML всех постов')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.only('pk', 'text')
+        if not options['all']:
+            posts = posts.filter(~Q(text_html_version=RENDERER_VERSION))
+        batch = []
+        total = 0
+        for post in posts.iterator():
+            post.text_html = render_text(post.text)
+            post.text_html_version = RENDERER_VERSION
+            batch.append(post)
+            if len(batch) == BATCH_SIZE:
+                total += self.save(batch)
+                batch = []
+        total += self.save(batch)
+        if total:
+            bump_feed_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано постов: {total}'))
+
+    def save(self, batch):
+        # bulk_update не трогает exch_date: это не правка поста
+        Post.objects.bulk_update(batch, ['text_html', 'text_html_version'])
+        return len(batch)
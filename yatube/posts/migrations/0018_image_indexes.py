@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, help_text='Выберите картинку для красоты', upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image_webp',
+            field=models.FileField(blank=True, db_index=True, editable=False, upload_to='posts/webp/', verbose_name='Картинка в WebP'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Полнотекстовый индекс постов и их комментариев (SQLite FTS5).
+# rowid строки индекса совпадает с id поста; триггеры держат индекс
+# в актуальном состоянии при любых изменениях, включая bulk_create.
+COMMENTS_OF = (
+    "coalesce((SELECT group_concat(text, ' ') FROM posts_comment "
+    "WHERE post_id = {post_id}), '')"
+)
+
+FORWARD_SQL = [
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    "text, comments, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO posts_search (rowid, text, comments) "
+    "SELECT id, text, " + COMMENTS_OF.format(post_id='posts_post.id')
+    + " FROM posts_post",
+    "CREATE TRIGGER posts_search_post_insert AFTER INSERT ON posts_post "
+    "BEGIN INSERT INTO posts_search (rowid, text, comments) "
+    "VALUES (new.id, new.text, ''); END",
+    "CREATE TRIGGER posts_search_post_update AFTER UPDATE OF text "
+    "ON posts_post BEGIN UPDATE posts_search SET text = new.text "
+    "WHERE rowid = new.id; END",
+    "CREATE TRIGGER posts_search_post_delete AFTER DELETE ON posts_post "
+    "BEGIN DELETE FROM posts_search WHERE rowid = old.id; END",
+    "CREATE TRIGGER posts_search_comment_insert AFTER INSERT "
+    "ON posts_comment BEGIN UPDATE posts_search SET comments = "
+    + COMMENTS_OF.format(post_id='new.post_id')
+    + " WHERE rowid = new.post_id; END",
+    "CREATE TRIGGER posts_search_comment_update AFTER UPDATE OF text "
+    "ON posts_comment BEGIN UPDATE posts_search SET comments = "
+    + COMMENTS_OF.format(post_id='new.post_id')
+    + " WHERE rowid = new.post_id; END",
+    "CREATE TRIGGER posts_search_comment_delete AFTER DELETE "
+    "ON posts_comment BEGIN UPDATE posts_search SET comments = "
+    + COMMENTS_OF.format(post_id='old.post_id')
+    + " WHERE rowid = old.post_id; END",
+]
+
+BACKWARD_SQL = [
+    'DROP TRIGGER IF EXISTS posts_search_post_insert',
+    'DROP TRIGGER IF EXISTS posts_search_post_update',
+    'DROP TRIGGER IF EXISTS posts_search_post_delete',
+    'DROP TRIGGER IF EXISTS posts_search_comment_insert',
+    'DROP TRIGGER IF EXISTS posts_search_comment_update',
+    'DROP TRIGGER IF EXISTS posts_search_comment_delete',
+    'DROP TABLE IF EXISTS posts_search',
+]
+
+
+def run_sql(statements):
+    def run(apps, schema_editor):
+        # на других СУБД поиск работает через LIKE, см. posts/search.py
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_image_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(FORWARD_SQL), run_sql(BACKWARD_SQL)),
+    ]
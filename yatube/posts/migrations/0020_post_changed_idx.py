@@ -0,0 +1,19 @@
+# Generated by Django 2.2.28 on 2026-10-18 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_search'),
+    ]
+
+    operations = [
+        # AddIndex, а не db_index: AlterField в SQLite пересоздаёт
+        # таблицу и теряет триггеры поискового индекса из 0019
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['exch_date'], name='post_changed_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations, models
+from django.utils.html import linebreaks
+
+BATCH_SIZE = 500
+
+
+def render_texts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = []
+    for post in Post.objects.only('pk', 'text').iterator():
+        post.text_html = linebreaks(post.text, autoescape=True)
+        post.text_html_version = 1
+        posts.append(post)
+        if len(posts) == BATCH_SIZE:
+            Post.objects.bulk_update(
+                posts, ['text_html', 'text_html_version'])
+            posts = []
+    Post.objects.bulk_update(posts, ['text_html', 'text_html_version'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_changed_idx'),
+    ]
+
+    # Колонки добавляются через ALTER TABLE: AddField в SQLite
+    # пересоздаёт таблицу и теряет триггеры поискового индекса из 0019
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    "ALTER TABLE posts_post "
+                    "ADD COLUMN text_html text NOT NULL DEFAULT ''",
+                    'ALTER TABLE posts_post DROP COLUMN text_html',
+                ),
+                migrations.RunSQL(
+                    'ALTER TABLE posts_post '
+                    'ADD COLUMN text_html_version smallint NOT NULL DEFAULT 0',
+                    'ALTER TABLE posts_post DROP COLUMN text_html_version',
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='post',
+                    name='text_html',
+                    field=models.TextField(blank=True, editable=False, verbose_name='Текст поста в HTML'),
+                ),
+                migrations.AddField(
+                    model_name='post',
+                    name='text_html_version',
+                    field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Версия рендерера текста'),
+                ),
+            ],
+        ),
+        migrations.RunPython(render_texts, migrations.RunPython.noop),
+    ]
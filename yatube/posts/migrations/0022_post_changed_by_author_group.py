@@ -0,0 +1,25 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_post_text_html'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['author', 'exch_date'],
+                name='post_author_changed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['group', 'exch_date'],
+                name='post_group_changed_idx'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+from django.db import migrations
+
+# Комментарии индексируются отдельными строками: rowid строки поста -
+# id поста, строки комментария - минус id комментария, а post_id у
+# обеих - пост, к которому относится строка. Каждый триггер меняет
+# одну строку индекса, а не склеивает заново все комментарии поста.
+FORWARD_SQL = [
+    'DROP TRIGGER IF EXISTS posts_search_post_insert',
+    'DROP TRIGGER IF EXISTS posts_search_post_update',
+    'DROP TRIGGER IF EXISTS posts_search_post_delete',
+    'DROP TRIGGER IF EXISTS posts_search_comment_insert',
+    'DROP TRIGGER IF EXISTS posts_search_comment_update',
+    'DROP TRIGGER IF EXISTS posts_search_comment_delete',
+    'DROP TABLE IF EXISTS posts_search',
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    "text, post_id UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2')",
+    'INSERT INTO posts_search (rowid, text, post_id) '
+    'SELECT id, text, id FROM posts_post',
+    'INSERT INTO posts_search (rowid, text, post_id) '
+    'SELECT -id, text, post_id FROM posts_comment',
+    'CREATE TRIGGER posts_search_post_insert AFTER INSERT ON posts_post '
+    'BEGIN INSERT INTO posts_search (rowid, text, post_id) '
+    'VALUES (new.id, new.text, new.id); END',
+    'CREATE TRIGGER posts_search_post_update AFTER UPDATE OF text '
+    'ON posts_post BEGIN UPDATE posts_search SET text = new.text '
+    'WHERE rowid = new.id; END',
+    'CREATE TRIGGER posts_search_post_delete AFTER DELETE ON posts_post '
+    'BEGIN DELETE FROM posts_search WHERE rowid = old.id; END',
+    'CREATE TRIGGER posts_search_comment_insert AFTER INSERT '
+    'ON posts_comment BEGIN INSERT INTO posts_search '
+    '(rowid, text, post_id) VALUES (-new.id, new.text, new.post_id); END',
+    'CREATE TRIGGER posts_search_comment_update AFTER UPDATE OF text '
+    'ON posts_comment BEGIN UPDATE posts_search SET text = new.text '
+    'WHERE rowid = -new.id; END',
+    'CREATE TRIGGER posts_search_comment_delete AFTER DELETE '
+    'ON posts_comment BEGIN DELETE FROM posts_search '
+    'WHERE rowid = -old.id; END',
+]
+
+COMMENTS_OF = (
+    "coalesce((SELECT group_concat(text, ' ') FROM posts_comment "
+    "WHERE post_id = {post_id}), '')"
+)
+
+# индекс и триггеры из 0019_post_search
+BACKWARD_SQL = FORWARD_SQL[:7] + [
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    "text, comments, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO posts_search (rowid, text, comments) "
+    "SELECT id, text, " + COMMENTS_OF.format(post_id='posts_post.id')
+    + " FROM posts_post",
+    "CREATE TRIGGER posts_search_post_insert AFTER INSERT ON posts_post "
+    "BEGIN INSERT INTO posts_search (rowid, text, comments) "
+    "VALUES (new.id, new.text, ''); END",
+    "CREATE TRIGGER posts_search_post_update AFTER UPDATE OF text "
+    "ON posts_post BEGIN UPDATE posts_search SET text = new.text "
+    "WHERE rowid = new.id; END",
+    "CREATE TRIGGER posts_search_post_delete AFTER DELETE ON posts_post "
+    "BEGIN DELETE FROM posts_search WHERE rowid = old.id; END",
+    "CREATE TRIGGER posts_search_comment_insert AFTER INSERT "
+    "ON posts_comment BEGIN UPDATE posts_search SET comments = "
+    + COMMENTS_OF.format(post_id='new.post_id')
+    + " WHERE rowid = new.post_id; END",
+    "CREATE TRIGGER posts_search_comment_update AFTER UPDATE OF text "
+    "ON posts_comment BEGIN UPDATE posts_search SET comments = "
+    + COMMENTS_OF.format(post_id='new.post_id')
+    + " WHERE rowid = new.post_id; END",
+    "CREATE TRIGGER posts_search_comment_delete AFTER DELETE "
+    "ON posts_comment BEGIN UPDATE posts_search SET comments = "
+    + COMMENTS_OF.format(post_id='old.post_id')
+    + " WHERE rowid = old.post_id; END",
+]
+
+
+def run_sql(statements):
+    def run(apps, schema_editor):
+        # на других СУБД поиск работает через LIKE, см. posts/search.py
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_post_changed_by_author_group'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(FORWARD_SQL), run_sql(BACKWARD_SQL)),
+    ]
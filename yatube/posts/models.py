@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils.safestring import mark_safe
+
+from .rendering import RENDERER_VERSION, render_text
 
 User = get_user_model()
 
@@ -48,17 +51,81 @@ class Post(models.Model):
         verbose_name='Картинка',
         upload_to='posts/',
         blank=True,
+        db_index=True,
         help_text='Выберите картинку для красоты'
     )
+    image_webp = models.FileField(
+        verbose_name='Картинка в WebP',
+        upload_to='posts/webp/',
+        blank=True,
+        db_index=True,
+        editable=False,
+    )
+    image_width = models.PositiveIntegerField(
+        verbose_name='Ширина картинки',
+        null=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='Высота картинки',
+        null=True,
+        editable=False,
+    )
+    comment_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев',
+        default=0,
+        editable=False,
+    )
+    text_html = models.TextField(
+        verbose_name='Текст поста в HTML',
+        blank=True,
+        editable=False,
+    )
+    text_html_version = models.PositiveSmallIntegerField(
+        verbose_name='Версия рендерера текста',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # id явно в конце: так индекс отдаёт строки в порядке курсора
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_feed_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'),
+            # время последнего изменения для условных GET-запросов
+            models.Index(fields=['exch_date'], name='post_changed_idx'),
+            models.Index(
+                fields=['author', 'exch_date'],
+                name='post_author_changed_idx'),
+            models.Index(
+                fields=['group', 'exch_date'],
+                name='post_group_changed_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def text_as_html(self):
+        """Готовый HTML текста, если его собрала текущая версия."""
+        if self.text_html_version == RENDERER_VERSION:
+            return mark_safe(self.text_html)
+        return render_text(self.text)
+
+    @property
+    def image_variant(self):
+        """Самый лёгкий из сохранённых вариантов картинки."""
+        return self.image_webp or self.image
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -88,6 +155,10 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'], name='comment_post_idx'),
+        ]
 
     def __str__(self):
         return self.text[:30]
@@ -114,9 +185,74 @@ class Follow(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'author'], name='unique_follow')
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.user == self.author:
             return
         else:
             super().save(*args, **kwargs)
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель ленты',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации поста',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_feed_idx'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики автора, которые поддерживаются сигналами."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Автор',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Количество постов',
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Количество подписок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+    def __str__(self):
+        return str(self.user)
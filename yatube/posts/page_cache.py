@@ -0,0 +1,102 @@
+"""Кеш страниц лент целиком, общий для всех посетителей.
+
+Страница рендерится один раз, а части, которые зависят от
+пользователя (шапка, вкладки лент, кнопка подписки), шаблоны выводят
+тегом {% esi %}. При рендере для кеша вместо них остаются метки,
+которые перед отдачей заменяются отрендеренными для текущего запроса
+фрагментами. Так тело ленты делят и анонимы, и вошедшие пользователи.
+
+Ключ страницы - путь, параметры пагинации (PAGE_PARAMS), поколение
+лент и состояние страницы из posts/conditional.py. Остальные параметры
+строки запроса (utm-метки, ?nocache=...) страницу не меняют и в ключ
+не входят, иначе любой новый параметр обходил бы кеш. Страницы лежат в кеше
+template_fragments, поэтому истёкшую страницу пересчитывает один
+запрос.
+"""
+import hashlib
+import json
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from .caching import feed_generation
+from .conditional import current_state
+from .loaders import loader
+
+PLACEHOLDER = re.compile(r'<!--esi:([\w=-]+)-->')
+# параметры запроса, от которых зависят кешируемые ленты
+PAGE_PARAMS = ('page', 'cursor')
+
+
+def placeholder(template_name, params):
+    """Метка фрагмента; параметры - строки и другие значения JSON."""
+    raw = json.dumps([template_name, params]).encode()
+    return f'<!--esi:{urlsafe_b64encode(raw).decode()}-->'
+
+
+def _panel_follow(request, author_username):
+    author = loader(request).user(author_username)
+    following = author is not None and loader(request).is_following(author)
+    return {'author': {'username': author_username}, 'following': following}
+
+
+# фрагменты, которым нужно больше, чем параметры метки
+FRAGMENT_CONTEXT = {
+    'posts/includes/panel_follow.html': _panel_follow,
+}
+
+
+def fill_placeholders(request, body):
+    """Подставляет в страницу фрагменты для текущего запроса."""
+    def render(match):
+        template_name, params = json.loads(
+            urlsafe_b64decode(match.group(1)))
+        context_for = FRAGMENT_CONTEXT.get(template_name)
+        context = context_for(request, **params) if context_for else params
+        return render_to_string(template_name, context, request=request)
+    return PLACEHOLDER.sub(render, body)
+
+
+def page_key(request, state):
+    params = [request.GET.get(name) for name in PAGE_PARAMS]
+    raw = repr((request.path, params, feed_generation(), state))
+    return 'page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def cached_page(page_state):
+    """Кеширует GET-страницу; page_state - как у conditional_page."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            state = current_state(request, page_state, *args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            key = page_key(request, state)
+            pages = caches['template_fragments']
+            body = pages.get(key)
+            if body is not None:
+                return HttpResponse(fill_placeholders(request, body))
+            request.esi_deferred = True
+            try:
+                response = view(request, *args, **kwargs)
+            except BaseException:
+                pages.release(key)
+                raise
+            finally:
+                request.esi_deferred = False
+            body = response.content.decode(response.charset)
+            if response.status_code == 200:
+                pages.set(key, body, settings.FEED_CACHE_TIMEOUT)
+            else:
+                pages.release(key)
+            response.content = fill_placeholders(request, body)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,72 @@
+"""Бюджет SQL-запросов на запрос к странице.
+
+Middleware считает запросы к базе и их суммарное время за запрос и
+пишет в лог posts.query_budget страницы, которые вышли за бюджет из
+settings.QUERY_BUDGETS (по имени URL, например 'post:index'). В
+строгом режиме (QUERY_BUDGET_STRICT) превышение - исключение; так
+N+1 ловится тестами, см. декоратор query_budget.
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.duration += time.perf_counter() - started
+
+
+def budget_for(url_name):
+    return settings.QUERY_BUDGETS.get(
+        url_name, settings.QUERY_BUDGET_DEFAULT)
+
+
+def query_budget_middleware(get_response):
+    def middleware(request):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = get_response(request)
+        match = request.resolver_match
+        if match is None:
+            return response
+        budget = budget_for(match.view_name)
+        if budget is not None and counter.queries > budget:
+            message = (
+                f'{match.view_name} {request.path}: '
+                f'{counter.queries} SQL-запросов за '
+                f'{counter.duration * 1000:.1f} мс, бюджет {budget}')
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+    return middleware
+
+
+def query_budget(budgets):
+    """Декоратор теста: строгий режим и бюджеты {'post:index': 4}."""
+    from django.test.utils import override_settings
+
+    return override_settings(
+        QUERY_BUDGET_STRICT=True,
+        QUERY_BUDGETS={**settings.QUERY_BUDGETS, **budgets},
+    )
@@ -0,0 +1,17 @@
+"""HTML текста поста, который собирается при сохранении.
+
+Ленты и страница поста выводят готовый Post.text_html и не прогоняют
+текст через linebreaks и экранирование при каждом рендере. Когда
+правила меняются, RENDERER_VERSION увеличивается: HTML старых версий
+не показывается (текст рендерится на лету), пока команда
+render_posts не пересоберёт его.
+"""
+from django.utils.html import linebreaks
+from django.utils.safestring import mark_safe
+
+RENDERER_VERSION = 1
+
+
+def render_text(text):
+    # текст уже экранирован: шаблоны выводят результат как есть
+    return mark_safe(linebreaks(text, autoescape=True))
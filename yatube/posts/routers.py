@@ -0,0 +1,79 @@
+"""Чтение лент с реплик базы.
+
+Представления лент, обёрнутые replica_reads, читают модели posts с
+одной из реплик settings.DATABASE_REPLICAS; запись, сессии и
+пользователи всегда идут в основную базу. Пока реплики нет, всё
+читается из основной.
+
+Реплика может отставать, поэтому сессия, которая только что писала,
+REPLICA_STICKY_SECONDS читает из основной базы и сразу видит свой пост
+или комментарий. Писавшим считается запрос с небезопасным методом
+(POST и т.п.); представления, которые пишут на GET, отмечают это сами
+через read_own_writes(). Служебная запись на GET, например пересчёт
+счётчиков автора, сессию к основной базе не привязывает.
+"""
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+
+# модели, которые можно читать с реплики
+REPLICA_APPS = {'posts'}
+STICKY_KEY = 'primary_reads_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_local = threading.local()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(_local, 'replica', None)
+        if replica and model._meta.app_label in REPLICA_APPS:
+            return replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # на репликах те же данные, что в основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схема приходит на реплики вместе с данными
+        return db not in settings.DATABASE_REPLICAS
+
+
+def replica_reads(view):
+    """Представление читает модели posts с реплики, если это можно."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        session = getattr(request, 'session', {})
+        sticky_until = session.get(STICKY_KEY, 0)
+        if not settings.DATABASE_REPLICAS or sticky_until > time.time():
+            return view(request, *args, **kwargs)
+        _local.replica = random.choice(settings.DATABASE_REPLICAS)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _local.replica = None
+    return wrapper
+
+
+def read_own_writes(request):
+    """Запрос с безопасным методом всё же записал данные пользователя."""
+    request.primary_reads = True
+
+
+def replica_middleware(get_response):
+    def middleware(request):
+        response = get_response(request)
+        wrote = (request.method not in SAFE_METHODS
+                 or getattr(request, 'primary_reads', False))
+        if wrote and settings.DATABASE_REPLICAS:
+            request.session[STICKY_KEY] = (
+                time.time() + settings.REPLICA_STICKY_SECONDS)
+        return response
+    return middleware
@@ -0,0 +1,219 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+На SQLite запросы идут в FTS5-таблицу posts_search (см. миграции
+0019_post_search и 0023_search_comment_rows): у поста и у каждого его
+комментария своя строка индекса, а пост ранжируется по лучшей из них
+(bm25); все слова запроса должны найтись в одной строке. В выдаче
+показывается фрагмент этой строки с подсвеченными словами. На других
+СУБД остаётся поиск через LIKE.
+
+Индекс держат в актуальном состоянии триггеры. Миграция, которая
+пересоздаёт таблицу постов или комментариев (в SQLite так работает
+AlterField), теряет их; после migrate недостающие триггеры создаются
+заново, см. restore_triggers().
+"""
+import logging
+import re
+
+from django.db import connection, connections, router
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# служебные символы, которыми FTS5 размечает совпадения во фрагменте
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 16
+
+MATCH_SQL = 'SELECT post_id FROM posts_search WHERE posts_search MATCH %s'
+COUNT_SQL = (
+    'SELECT count(DISTINCT post_id) FROM posts_search '
+    'WHERE posts_search MATCH %s'
+)
+# bm25 нельзя вызвать в агрегате: совпадения считаются отдельно
+# (MATERIALIZED не даёт SQLite встроить подзапрос; SQLite 3.35+, версию
+# проверяет posts/sqlite_backend), а у лучшей строки поста берётся её
+# rowid для фрагмента
+RANKED_SQL = (
+    'WITH hits AS MATERIALIZED ('
+    'SELECT rowid AS hit, post_id, bm25(posts_search) AS score '
+    'FROM posts_search WHERE posts_search MATCH %s) '
+    'SELECT post_id, hit, min(score) FROM hits GROUP BY post_id '
+    'ORDER BY min(score) LIMIT %s OFFSET %s'
+)
+SNIPPET_SQL = (
+    "SELECT rowid, snippet(posts_search, 0, %s, %s, '…', %s) "
+    'FROM posts_search WHERE posts_search MATCH %s AND rowid IN ({hits})'
+)
+INDEX_SQL = [
+    'INSERT OR REPLACE INTO posts_search (rowid, text, post_id) '
+    'SELECT id, text, id FROM posts_post WHERE id >= %s',
+    'INSERT OR REPLACE INTO posts_search (rowid, text, post_id) '
+    'SELECT -id, text, post_id FROM posts_comment WHERE post_id >= %s',
+]
+# триггеры из 0023_search_comment_rows
+TRIGGERS = {
+    'posts_search_post_insert':
+        'AFTER INSERT ON posts_post BEGIN INSERT INTO posts_search '
+        '(rowid, text, post_id) VALUES (new.id, new.text, new.id); END',
+    'posts_search_post_update':
+        'AFTER UPDATE OF text ON posts_post BEGIN UPDATE posts_search '
+        'SET text = new.text WHERE rowid = new.id; END',
+    'posts_search_post_delete':
+        'AFTER DELETE ON posts_post BEGIN DELETE FROM posts_search '
+        'WHERE rowid = old.id; END',
+    'posts_search_comment_insert':
+        'AFTER INSERT ON posts_comment BEGIN INSERT INTO posts_search '
+        '(rowid, text, post_id) VALUES (-new.id, new.text, new.post_id); '
+        'END',
+    'posts_search_comment_update':
+        'AFTER UPDATE OF text ON posts_comment BEGIN UPDATE posts_search '
+        'SET text = new.text WHERE rowid = -new.id; END',
+    'posts_search_comment_delete':
+        'AFTER DELETE ON posts_comment BEGIN DELETE FROM posts_search '
+        'WHERE rowid = -old.id; END',
+}
+
+
+def _reading():
+    """Соединение, из которого читаются посты: реплика в replica_reads.
+
+    Совпадения и сами посты должны браться из одной базы, иначе на
+    отстающей реплике число результатов и страница разойдутся.
+    """
+    return connections[router.db_for_read(Post)]
+
+
+def uses_fts():
+    return _reading().vendor == 'sqlite'
+
+
+def fts_query(query):
+    """Строка запроса FTS5: все слова обязательны, ищутся по префиксу.
+
+    Каждое слово берётся в кавычки, поэтому операторы FTS5 из
+    пользовательского ввода не интерпретируются.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и превращает метки совпадений в <mark>."""
+    html = escape(snippet)
+    html = html.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+def index_posts(first_id):
+    """Индексирует посты с id от first_id вместе с комментариями.
+
+    Для постов, вставленных в обход триггеров индекса (см.
+    posts/generator.py).
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for sql in INDEX_SQL:
+            cursor.execute(sql, [first_id])
+
+
+def _current_index(connection):
+    """В базе индекс из 0023_search_comment_rows."""
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA table_info(posts_search)')
+        return 'post_id' in {row[1] for row in cursor.fetchall()}
+
+
+def missing_triggers(connection):
+    """Имена триггеров индекса, которых нет в базе."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {row[0] for row in cursor.fetchall()}
+    return sorted(set(TRIGGERS) - existing)
+
+
+def restore_triggers(connection):
+    """Создаёт заново триггеры индекса, потерянные миграциями."""
+    if connection.vendor != 'sqlite' or not _current_index(connection):
+        return
+    missing = missing_triggers(connection)
+    if not missing:
+        return
+    logger.warning('Триггеры поиска созданы заново: %s', ', '.join(missing))
+    with connection.cursor() as cursor:
+        for name in missing:
+            cursor.execute(f'CREATE TRIGGER {name} {TRIGGERS[name]}')
+
+
+def matching_posts(queryset, query):
+    """Сужает queryset постов до найденных, без ранжирования."""
+    match = fts_query(query)
+    if not match:
+        return queryset.none()
+    if not uses_fts():
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(pk__in=RawSQL(MATCH_SQL, [match]))
+
+
+class SearchResults:
+    """Результаты поиска для Paginator: считает и режет их сам.
+
+    Посты страницы загружаются одним запросом и получают атрибут
+    search_snippet с подсвеченным фрагментом.
+    """
+    def __init__(self, query):
+        self.query = query
+        self.match = fts_query(query)
+
+    def count(self):
+        if not self.match:
+            return 0
+        if not uses_fts():
+            return matching_posts(Post.objects.all(), self.query).count()
+        with _reading().cursor() as cursor:
+            cursor.execute(COUNT_SQL, [self.match])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not self.match:
+            return []
+        offset = key.start or 0
+        limit = key.stop - offset
+        if not uses_fts():
+            posts = list(matching_posts(
+                Post.objects.select_related('author', 'group'),
+                self.query)[offset:key.stop])
+            for post in posts:
+                post.search_snippet = escape(post.text[:200])
+            return posts
+        with _reading().cursor() as cursor:
+            cursor.execute(RANKED_SQL, [self.match, limit, offset])
+            ranked = cursor.fetchall()
+            hits = [hit for _, hit, _ in ranked]
+            snippets = {}
+            if hits:
+                cursor.execute(
+                    SNIPPET_SQL.format(hits=', '.join(['%s'] * len(hits))),
+                    [MARK_START, MARK_END, SNIPPET_TOKENS, self.match,
+                     *hits])
+                snippets = dict(cursor.fetchall())
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for post_id, _, _ in ranked])
+        results = []
+        for post_id, hit, _ in ranked:
+            post = posts.get(post_id)
+            if post is not None:
+                post.search_snippet = highlight(snippets.get(hit, ''))
+                results.append(post)
+        return results
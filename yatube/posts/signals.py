@@ -0,0 +1,120 @@
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import counters, follow_graph, search, thumbnails, timeline
+from .caching import bump_feed_generation
+from .database import apply_pragmas
+from .images import release_image
+from .models import Comment, Follow, Group, Post
+from .rendering import RENDERER_VERSION, render_text
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def feed_changed(sender, **kwargs):
+    bump_feed_generation()
+
+
+@receiver(post_save, sender=Post)
+def post_counted(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_uncounted(sender, instance, **kwargs):
+    counters.bump(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_counted(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_comment_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncounted(sender, instance, **kwargs):
+    counters.bump_comment_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_counted(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(instance.author_id, 'followers_count', 1)
+        counters.bump(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_uncounted(sender, instance, **kwargs):
+    counters.bump(instance.author_id, 'followers_count', -1)
+    counters.bump(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_graph_added(sender, instance, created, **kwargs):
+    if created:
+        follow_graph.changed(added=[(instance.user_id, instance.author_id)])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_graph_removed(sender, instance, **kwargs):
+    follow_graph.changed(removed=[(instance.user_id, instance.author_id)])
+
+
+@receiver(post_migrate)
+def follow_graph_reset(sender, **kwargs):
+    # после миграций и flush (в том числе между тестами) граф устарел
+    follow_graph.invalidate()
+
+
+@receiver(post_migrate)
+def search_triggers_restored(sender, using, **kwargs):
+    # AlterField в SQLite пересоздаёт таблицу вместе с её триггерами
+    if sender.label == 'posts':
+        search.restore_triggers(connections[using])
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_prune(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def post_rendered(sender, instance, **kwargs):
+    instance.text_html = render_text(instance.text)
+    instance.text_html_version = RENDERER_VERSION
+
+
+@receiver(post_save, sender=Post)
+def post_thumbnails(sender, instance, **kwargs):
+    thumbnails.schedule_thumbnails(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_images_released(sender, instance, **kwargs):
+    release_image('image', instance.image.name)
+    release_image('image_webp', instance.image_webp.name)
+
+
+@receiver(connection_created)
+def connection_tuned(sender, connection, **kwargs):
+    apply_pragmas(connection)
@@ -0,0 +1,36 @@
+"""SQLite, в которой транзакции сразу берут блокировку записи.
+
+Обычный BEGIN откладывает блокировку до первой записи. Если до неё
+транзакция успела прочитать, а другой писатель - закоммитить, SQLite
+не ждёт по busy_timeout, а сразу отвечает database is locked. С BEGIN
+IMMEDIATE пишущие транзакции встают в очередь в самом начале.
+Читающие запросы идут вне транзакций и блокировку не берут.
+
+Проекту нужна SQLite не старше MIN_SQLITE_VERSION: массовая подписка
+читает вставленные и удалённые строки через RETURNING
+(posts/follows.py), а поиск ранжирует совпадения в MATERIALIZED CTE
+(posts/search.py). На старой системной SQLite backend не загрузится,
+а не упадёт синтаксической ошибкой посреди запроса.
+"""
+from sqlite3 import sqlite_version, sqlite_version_info
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+MIN_SQLITE_VERSION = (3, 35)
+
+
+def check_sqlite_version(version_info=sqlite_version_info,
+                         version=sqlite_version):
+    if version_info < MIN_SQLITE_VERSION:
+        raise ImproperlyConfigured(
+            'Нужна SQLite {}.{} или новее, установлена {}'.format(
+                *MIN_SQLITE_VERSION, version))
+
+
+check_sqlite_version()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,104 @@
+"""Замер времени рендера шаблонов и вставок.
+
+Loader оборачивает другие загрузчики, и каждый шаблон, который они
+отдают, засекает время своего рендера: страницы, базовые шаблоны
+{% extends %} и вставки {% include %}. Время включает вложенные
+шаблоны. Middleware собирает замеры за запрос, отдаёт самые долгие в
+заголовке Server-Timing (их видно в инструментах разработчика
+браузера) и пишет их в лог posts.template_timing. По ним видно,
+какие фрагменты стоит кешировать.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.template import TemplateDoesNotExist
+from django.template.loaders.base import Loader as BaseLoader
+
+logger = logging.getLogger(__name__)
+
+# сколько самых долгих шаблонов попадает в заголовок
+SERVER_TIMING_LIMIT = 10
+
+_local = threading.local()
+
+
+def _record(template_name, seconds):
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        count, total = timings[template_name]
+        timings[template_name] = (count + 1, total + seconds)
+
+
+class TimedTemplate:
+    """Шаблон, который засекает время своего рендера."""
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def _render(self, context):
+        # через _render рендерятся и базовые шаблоны {% extends %}
+        started = time.perf_counter()
+        try:
+            return self.template._render(context)
+        finally:
+            _record(self.template.name, time.perf_counter() - started)
+
+    def render(self, context):
+        # как Template.render, но с замером в _render
+        with context.render_context.push_state(self):
+            if context.template is None:
+                with context.bind_template(self):
+                    context.template_name = self.name
+                    return self._render(context)
+            return self._render(context)
+
+
+class Loader(BaseLoader):
+    """Отдаёт шаблоны вложенных загрузчиков с замером рендера."""
+    def __init__(self, engine, loaders):
+        super().__init__(engine)
+        self.loaders = engine.get_template_loaders(loaders)
+
+    def get_template(self, template_name, skip=None):
+        tried = []
+        for loader in self.loaders:
+            try:
+                return TimedTemplate(
+                    loader.get_template(template_name, skip=skip))
+            except TemplateDoesNotExist as error:
+                tried.extend(error.tried)
+        raise TemplateDoesNotExist(template_name, tried=tried)
+
+    def reset(self):
+        for loader in self.loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
+
+
+def template_timing_middleware(get_response):
+    def middleware(request):
+        if getattr(_local, 'timings', None) is not None:
+            # замеры уже собирает внешний экземпляр
+            return get_response(request)
+        _local.timings = defaultdict(lambda: (0, 0.0))
+        try:
+            response = get_response(request)
+        finally:
+            timings = _local.timings
+            del _local.timings
+        slowest = sorted(
+            timings.items(), key=lambda item: item[1][1], reverse=True,
+        )[:SERVER_TIMING_LIMIT]
+        if slowest:
+            response['Server-Timing'] = ', '.join(
+                f'tpl{i};desc="{name} x{count}";dur={total * 1000:.1f}'
+                for i, (name, (count, total)) in enumerate(slowest))
+            logger.debug('%s %s', request.path, '; '.join(
+                f'{name} x{count} {total * 1000:.1f} мс'
+                for name, (count, total) in slowest))
+        return response
+    return middleware
@@ -0,0 +1,20 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.page_cache import placeholder
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def esi(context, template_name, **params):
+    """Фрагмент, который кеш страниц рендерит для каждого запроса.
+
+    Вне кеша страниц работает как include с параметрами.
+    """
+    request = context.get('request')
+    if getattr(request, 'esi_deferred', False):
+        return mark_safe(placeholder(template_name, params))
+    fragment = context.template.engine.get_template(template_name)
+    with context.push(**params):
+        return fragment.render(context)
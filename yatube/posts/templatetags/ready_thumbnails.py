@@ -0,0 +1,11 @@
+from django import template
+
+from posts.thumbnails import ready_thumbnail as lookup_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(image, geometry_string, **options):
+    """Готовая миниатюра картинки или None, если она ещё строится."""
+    return lookup_thumbnail(image, geometry_string, **options)
@@ -0,0 +1,78 @@
+import random
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from ..benchmark import build_dataset, run_scenario
+from ..management.commands.bench import mixed, scenarios
+from ..models import AuthorStats, Comment, Follow, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+# данные должны быть закоммичены: сценарии ходят в базу из своих потоков
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class BenchmarkTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_dataset_fills_counters(self):
+        counts = build_dataset(
+            users=5, groups=2, posts=20, comments=10, follows=6,
+            image_share=0.5, seed=1)
+        self.assertEqual(counts['follows'], 6)
+        self.assertEqual(Post.objects.count(), 20)
+        self.assertEqual(Comment.objects.count(), 10)
+        self.assertEqual(Follow.objects.count(), 6)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertFalse(Post.objects.filter(text_html='').exists())
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('posts_count', flat=True)),
+            20)
+
+    def test_scenario_report(self):
+        build_dataset(
+            users=3, groups=1, posts=5, comments=0, follows=0,
+            image_share=0, seed=1)
+        report = run_scenario(
+            lambda client, i: client.get(reverse('post:index')),
+            requests=6, concurrency=2)
+        self.assertEqual(report['requests'], 6)
+        self.assertEqual(report['errors'], 0)
+        self.assertLessEqual(report['p50_ms'], report['p99_ms'])
+        self.assertGreater(report['queries_per_request'], 0)
+
+    def test_scenarios_without_groups_or_posts(self):
+        build_dataset(
+            users=2, groups=0, posts=0, comments=0, follows=0,
+            image_share=0, seed=1)
+        rng = random.Random(1)
+        self.assertListEqual(
+            list(scenarios(rng)),
+            ['index', 'profile', 'follow_index', 'post_create'])
+        self.assertIsNone(mixed(rng))
+
+    def test_empty_report(self):
+        report = run_scenario(
+            lambda client, i: client.get(reverse('post:index')),
+            requests=0, concurrency=2)
+        self.assertEqual(report['requests'], 0)
+        self.assertEqual(report['queries_per_request'], 0)
+
+    def test_invalid_options_are_rejected(self):
+        for options in [
+            {'users': 0, 'posts': 5},
+            {'posts': 0, 'comments': 5},
+            {'concurrency': 0},
+            {'requests': -1},
+        ]:
+            with self.subTest(options=options):
+                with self.assertRaises(CommandError):
+                    call_command('bench', **options)
@@ -1,11 +1,19 @@
 import datetime as dt
+import os
+import tempfile
+from io import StringIO
 from time import sleep
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
 from django.test import Client, TestCase
 from django.urls import reverse
 
-from ..models import Group, Post
+from ..cache_backends import SQLiteCache
+from ..caching import cached, feed_generation
+from ..models import Comment, Group, Post
 
 User = get_user_model()
 
@@ -29,6 +37,7 @@ class PostCacheTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -49,3 +58,215 @@ class PostCacheTest(TestCase):
             if response.content != first_page:
                 break
         self.assertNotEqual(response.content, first_page)
+
+    def test_new_post_invalidates_main_page_at_once(self):
+        self.authorized_client.get(reverse('post:index'))
+        new_post = Post.objects.create(
+            author=self.user,
+            text='Свежее сообщение',
+        )
+        response = self.authorized_client.get(reverse('post:index'))
+        self.assertContains(response, new_post.text)
+
+    def test_pages_of_main_page_cached_separately(self):
+        for i in range(10):
+            Post.objects.create(author=self.user, text='пост-' + str(i))
+        self.authorized_client.get(reverse('post:index'))
+        response = self.authorized_client.get(
+            reverse('post:index') + '?page=2')
+        self.assertContains(response, 'сообщение-1')
+
+    def test_comment_bumps_feed_generation(self):
+        generation = feed_generation()
+        Comment.objects.create(
+            post=self.post, author=self.user, text='комментарий')
+        self.assertGreater(feed_generation(), generation)
+
+
+class StaleWhileRevalidateTest(TestCase):
+    def setUp(self):
+        self.fragments = caches['template_fragments']
+        # вместе с обёрнутым кешем сбрасывает счётчики процесса
+        self.fragments.clear()
+        self.now = 1000.0
+        clock = mock.patch(
+            'posts.cache_backends.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_only_one_request_recomputes_expired_value(self):
+        self.assertEqual(cached('key', lambda: 'old', 10), 'old')
+        self.assertEqual(cached('key', lambda: 'unused', 10), 'old')
+        self.now += 11
+        # первый запрос после таймаута пересчитывает, пока он не закончил,
+        # остальные получают старое значение
+        self.assertIsNone(self.fragments.get('key'))
+        self.assertEqual(self.fragments.get('key'), 'old')
+        self.fragments.set('key', 'new', 10)
+        self.assertEqual(self.fragments.get('key'), 'new')
+        self.assertEqual(
+            self.fragments.stats(), {'hit': 2, 'miss': 2, 'stale': 1})
+        # чтения ничего не пишут: счётчики переносятся в кеш при set()
+        with mock.patch.object(
+                self.fragments._cache, 'incr', side_effect=AssertionError):
+            self.fragments.get('key')
+
+    def test_cold_key_waits_for_the_first_computation(self):
+        self.assertIsNone(self.fragments.get('key'))
+
+        def computed_meanwhile(seconds):
+            self.fragments.set('key', 'value', 10)
+
+        with mock.patch('posts.cache_backends.time.sleep',
+                        side_effect=computed_meanwhile):
+            self.assertEqual(self.fragments.get('key'), 'value')
+
+    def test_abandoned_computation_is_not_awaited(self):
+        self.assertIsNone(self.fragments.get('key'))
+
+        def abandoned_meanwhile(seconds):
+            self.fragments.release('key')
+
+        with mock.patch('posts.cache_backends.time.sleep',
+                        side_effect=abandoned_meanwhile) as sleep_:
+            self.assertIsNone(self.fragments.get('key'))
+            self.assertEqual(sleep_.call_count, 1)
+            # пересчёт достался этому запросу, следующий снова ждёт
+            self.assertIsNone(self.fragments.get('key'))
+            self.assertEqual(sleep_.call_count, 2)
+
+    def test_value_expires_after_grace_period(self):
+        self.fragments.set('key', 'old', 10)
+        self.now += 10 + self.fragments.grace + 1
+        self.assertFalse(self.fragments.has_key('key'))
+
+    def test_recompute_may_start_before_timeout(self):
+        self.fragments.get('key')
+        self.now += 5
+        self.fragments.set('key', 'slow', 10)
+        self.now += 9
+        with mock.patch('posts.cache_backends.random.random',
+                        return_value=0.99):
+            self.assertIsNone(self.fragments.get('key'))
+
+    def test_cache_tag_uses_fragment_cache(self):
+        user = User.objects.create_user(username='auth')
+        client = Client()
+        client.force_login(user)
+        client.get(reverse('post:index'))
+        client.get(reverse('post:index'))
+        self.assertEqual(self.fragments.stats()['hit'], 1)
+        out = StringIO()
+        call_command('cache_stats', stdout=out)
+        self.assertIn('hit 1', out.getvalue())
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_values_are_shared_between_instances(self):
+        # отдельный объект бэкенда - как кеш другого процесса
+        other = self.make_cache()
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(other.get('key'), {'value': 1})
+        self.assertFalse(other.add('key', 'other'))
+        self.assertTrue(other.add('counter', 1))
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_connection_is_not_reused_after_fork(self):
+        self.cache.set('key', 'value')
+        inherited = self.cache._db
+        with mock.patch('posts.cache_backends.os.getpid',
+                        return_value=os.getpid() + 1):
+            self.assertEqual(self.cache.get('key'), 'value')
+            self.assertIsNot(self.cache._db, inherited)
+        self.cache.disconnect()
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_expired_values_are_not_returned(self):
+        self.cache.set('key', 'value', 0.01)
+        sleep(0.02)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertEqual(self.cache.get('key'), 'new')
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_least_recently_used_values_are_evicted(self):
+        cache = self.make_cache(MAX_ENTRIES=3)
+        with mock.patch('posts.cache_backends.time.time') as clock:
+            for i in range(4):
+                clock.return_value = 1000 + i * 10
+                cache.set(f'key-{i}', i)
+            clock.return_value = 1100
+            cache.get('key-0')
+            cache.cull()
+            self.assertEqual(
+                [cache.has_key(f'key-{i}') for i in range(4)],
+                [True, False, True, True])
+
+    def test_size_limit(self):
+        cache = self.make_cache(MAX_SIZE=1000)
+        cache.set('old', 'x' * 600)
+        sleep(0.01)
+        cache.set('new', 'x' * 600)
+        cache.cull()
+        self.assertFalse(cache.has_key('old'))
+        self.assertTrue(cache.has_key('new'))
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='сообщение')
+        cls.address = reverse(
+            'post:profile', kwargs={'username': cls.author.username})
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_cached_page_is_shared_with_personal_fragments(self):
+        response = self.guest_client.get(self.address)
+        self.assertTemplateUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'Войти')
+        response = self.authorized_client.get(self.address)
+        # тело страницы из кеша, шапка и кнопка подписки - свои
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertContains(response, 'Подписаться')
+        self.assertNotContains(response, '<!--esi:')
+
+    def test_cached_page_follows_changes(self):
+        self.guest_client.get(self.address)
+        self.authorized_client.get(reverse(
+            'post:profile_follow', kwargs={'username': self.author}))
+        response = self.authorized_client.get(self.address)
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Отписаться')
+        Post.objects.create(author=self.author, text='новое сообщение')
+        self.assertContains(
+            self.guest_client.get(self.address), 'новое сообщение')
+
+    def test_unrelated_query_params_share_cached_page(self):
+        self.guest_client.get(self.address)
+        response = self.guest_client.get(
+            self.address, {'utm_source': 'mail', 'nocache': '1'})
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        response = self.guest_client.get(self.address, {'page': '2'})
+        self.assertTemplateUsed(response, 'posts/profile.html')
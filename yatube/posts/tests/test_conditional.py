@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test_group',
+            description='This is test group'
+        )
+        cls.post = Post.objects.create(
+            text='Simple text', author=cls.author, group=cls.group)
+        cls.addresses = [
+            reverse('post:index'),
+            reverse('post:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('post:profile', kwargs={'username': cls.author}),
+            reverse('post:post_detail', kwargs={'post_id': cls.post.pk}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def revalidate(self, client, address, response):
+        return client.get(address, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_are_not_rendered_again(self):
+        for address in self.addresses:
+            with self.subTest(address=address):
+                response = self.guest_client.get(address)
+                self.assertIn('Cookie', response['Vary'])
+                repeated = self.revalidate(
+                    self.guest_client, address, response)
+                self.assertEqual(repeated.status_code, 304)
+                self.assertFalse(repeated.templates)
+
+    def test_changes_invalidate_validators(self):
+        responses = {
+            address: self.guest_client.get(address)
+            for address in self.addresses
+        }
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='comment')
+        for address, response in responses.items():
+            with self.subTest(address=address):
+                self.assertEqual(self.revalidate(
+                    self.guest_client, address, response).status_code, 200)
+
+    def test_deletes_invalidate_validators(self):
+        extra = Post.objects.create(
+            text='Extra', author=self.author, group=self.group)
+        responses = {
+            address: self.guest_client.get(address)
+            for address in self.addresses[:3]
+        }
+        extra.delete()
+        for address, response in responses.items():
+            with self.subTest(address=address):
+                self.assertFalse(response.has_header('Last-Modified'))
+                self.assertEqual(self.revalidate(
+                    self.guest_client, address, response).status_code, 200)
+
+    def test_validators_depend_on_user_and_following(self):
+        address = reverse('post:profile', kwargs={'username': self.author})
+        response = self.guest_client.get(address)
+        self.assertEqual(self.revalidate(
+            self.authorized_client, address, response).status_code, 200)
+        response = self.authorized_client.get(address)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.revalidate(
+            self.authorized_client, address, response).status_code, 200)
+
+    def test_missing_pages_have_no_validators(self):
+        response = self.guest_client.get(
+            reverse('post:post_detail', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.post = Post.objects.create(text='first post', author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_create_and_delete(self):
+        second = Post.objects.create(text='second post', author=self.author)
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        second.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='comment')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+        self.authorized_client.get(reverse(
+            'post:profile_follow', kwargs={'username': self.author}))
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.authorized_client.get(reverse(
+            'post:profile_unfollow', kwargs={'username': self.author}))
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_profile_and_detail_without_aggregates(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        addresses = [
+            reverse('post:profile', kwargs={'username': self.author}),
+            reverse('post:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(address)
+                self.assertFalse(any(
+                    'COUNT(' in query['sql']
+                    for query in queries.captured_queries))
+
+    def test_recount_stats_fixes_drift(self):
+        AuthorStats.objects.filter(user=self.author).update(posts_count=42)
+        Post.objects.filter(pk=self.post.pk).update(comment_count=7)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_recount_stats_queries_do_not_grow_with_data(self):
+        users = [
+            User.objects.create(username=f'user{i}') for i in range(30)]
+        for user in users:
+            Post.objects.create(text='post', author=user)
+            Comment.objects.create(
+                post=self.post, author=user, text='comment')
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.filter(user=self.reader).delete()
+        AuthorStats.objects.filter(user=self.author).update(
+            followers_count=5)
+        Post.objects.update(comment_count=3)
+        with CaptureQueriesContext(connection) as queries:
+            output = StringIO()
+            call_command('recount_stats', stdout=output)
+        self.assertLess(len(queries), 15)
+        self.assertIn('авторов 2, постов 31', output.getvalue())
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 30)
@@ -0,0 +1,92 @@
+import os
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection
+from django.test import RequestFactory, TransactionTestCase, override_settings
+
+from ..database import atomic_with_retry
+from ..sqlite_backend.base import DatabaseWrapper, check_sqlite_version
+
+
+class SQLiteTuningTest(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+
+    def connect(self, **settings):
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': self.path, **settings},
+            alias='tuned')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connection_gets_pragmas(self):
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        # NORMAL
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+
+    def test_old_sqlite_is_rejected(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, '3.35'):
+            check_sqlite_version((3, 31, 1), '3.31.1')
+        check_sqlite_version((3, 35, 0), '3.35.0')
+
+    def test_transaction_takes_write_lock_at_begin(self):
+        writer = self.connect()
+        with writer.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id integer)')
+        other = self.connect(OPTIONS={'timeout': 0})
+        with override_settings(SQLITE_PRAGMAS={}):
+            other.ensure_connection()
+        writer.set_autocommit(
+            False, force_begin_transaction_with_broken_autocommit=True)
+        try:
+            with self.assertRaisesMessage(OperationalError, 'locked'):
+                with other.cursor() as cursor:
+                    cursor.execute('INSERT INTO item VALUES (1)')
+        finally:
+            writer.rollback()
+            writer.set_autocommit(True)
+
+
+@override_settings(SQLITE_WRITE_RETRIES=2, SQLITE_RETRY_BACKOFF=0)
+class AtomicWithRetryTest(TransactionTestCase):
+    def call(self, errors, method='post'):
+        calls = []
+
+        @atomic_with_retry
+        def view(request):
+            calls.append(connection.in_atomic_block)
+            if errors:
+                raise errors.pop(0)
+            return 'ok'
+
+        return view(getattr(RequestFactory(), method)('/')), calls
+
+    def test_retries_locked_database(self):
+        result, calls = self.call([OperationalError('database is locked')])
+        self.assertEqual(result, 'ok')
+        self.assertEqual(calls, [True, True])
+
+    def test_safe_requests_take_no_write_lock(self):
+        result, calls = self.call([], method='get')
+        self.assertEqual(result, 'ok')
+        self.assertEqual(calls, [False])
+
+    def test_gives_up_after_retries(self):
+        with self.assertRaises(OperationalError):
+            self.call([OperationalError('database is locked')] * 3)
+
+    def test_other_errors_are_not_retried(self):
+        errors = [OperationalError('no such table'), None]
+        with self.assertRaisesMessage(OperationalError, 'no such table'):
+            self.call(errors)
+        self.assertEqual(errors, [None])
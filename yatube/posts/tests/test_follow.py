@@ -1,8 +1,19 @@
+import tempfile
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Post
+from .. import follow_graph
+from ..counters import recount
+from ..follows import follow_authors, unfollow_authors
+from ..models import AuthorStats, Follow, Post, TimelineEntry
+from ..timeline import timeline_posts
 
 User = get_user_model()
 
@@ -50,3 +61,158 @@ class PostFollowTest(TestCase):
         response = self.authorized_client.get(reverse('post:follow_index'))
         self.assertNotIn(
             test_post, list(response.context['page_obj'].object_list))
+
+    def test_timeline_fan_out_backfill_and_prune(self):
+        user_temp = User.objects.create(username='user_temp')
+        old_post = Post.objects.create(text='old post', author=user_temp)
+        Follow.objects.create(user=self.user_main, author=user_temp)
+        new_post = Post.objects.create(text='new post', author=user_temp)
+        timeline = TimelineEntry.objects.filter(user=self.user_main)
+        self.assertSetEqual(
+            {old_post.pk, new_post.pk},
+            set(timeline.values_list('post_id', flat=True)))
+        Follow.objects.filter(user=self.user_main, author=user_temp).delete()
+        self.assertFalse(timeline.exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_posts_read_without_fan_out(self):
+        user_temp = User.objects.create(username='user_temp')
+        Follow.objects.create(user=self.user_main, author=user_temp)
+        test_post = Post.objects.create(text='one post', author=user_temp)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_main).exists())
+        response = self.authorized_client.get(reverse('post:follow_index'))
+        self.assertIn(
+            test_post, list(response.context['page_obj'].object_list))
+
+    def test_popular_author_merged_with_materialized_timeline(self):
+        popular = User.objects.create(username='popular')
+        regular = User.objects.create(username='regular')
+        fans = [User.objects.create(username=f'fan{i}') for i in range(2)]
+        Follow.objects.create(user=self.user_main, author=regular)
+        Follow.objects.create(user=self.user_main, author=popular)
+        old_post = Post.objects.create(text='old popular', author=popular)
+        for fan in fans:
+            Follow.objects.create(user=fan, author=popular)
+        posts = [
+            Post.objects.create(text=f'post {i}', author=author)
+            for i, author in enumerate([regular, popular] * 6)]
+        with self.settings(TIMELINE_FANOUT_LIMIT=1):
+            response = self.authorized_client.get(
+                reverse('post:follow_index'))
+            first_page = list(response.context['page_obj'].object_list)
+            response = self.authorized_client.get(
+                reverse('post:follow_index'), {'page': 2})
+            second_page = list(response.context['page_obj'].object_list)
+            with CaptureQueriesContext(connection) as queries:
+                list(timeline_posts(self.user_main)[:10])
+        # обычный автор по-прежнему читается из материализованной ленты
+        self.assertTrue(any(
+            'posts_timelineentry' in query['sql']
+            for query in queries.captured_queries))
+        self.assertEqual(
+            first_page + second_page, [*reversed(posts), old_post])
+
+
+class BulkFollowTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(username='reader')
+        cls.authors = [
+            User.objects.create(username=f'author{i}') for i in range(3)]
+        for author in cls.authors:
+            Post.objects.create(text='post', author=author)
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assertStatsConsistent(self, *users):
+        for user in users:
+            stats = AuthorStats.objects.get(user=user)
+            fresh = recount(user)
+            self.assertEqual(
+                (stats.followers_count, stats.following_count),
+                (fresh.followers_count, fresh.following_count))
+
+    def test_follow_many(self):
+        response = self.client.post(reverse('post:follow_many'), {
+            'authors': 'author0, author1\nauthor2 reader nobody'})
+        self.assertEqual(response.json(), {
+            'changed': 2, 'unchanged': 2, 'unknown': ['nobody']})
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 3)
+        self.assertStatsConsistent(self.reader, *self.authors)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3)
+        for author in self.authors:
+            self.assertTrue(
+                follow_graph.is_following(self.reader.pk, author.pk))
+
+    def test_unfollow_many(self):
+        self.client.post(reverse('post:follow_many'), {
+            'authors': 'author1 author2'})
+        response = self.client.post(reverse('post:unfollow_many'), {
+            'authors': 'author0 author1'})
+        self.assertEqual(response.json(), {
+            'changed': 2, 'unchanged': 0, 'unknown': []})
+        self.assertListEqual(
+            list(Follow.objects.filter(user=self.reader).values_list(
+                'author__username', flat=True)), ['author2'])
+        self.assertStatsConsistent(self.reader, *self.authors)
+        self.assertSetEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.reader).values_list('post__author', flat=True)),
+            {self.authors[2].pk})
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.authors[0].pk))
+
+    def test_counts_only_rows_actually_changed(self):
+        # подписку author0 успела создать другая транзакция после сверки
+        with mock.patch('posts.follows._followed_ids', return_value=set()):
+            result = follow_authors(self.reader, ['author0', 'author1'])
+        self.assertEqual(result['changed'], 1)
+        self.assertStatsConsistent(self.reader, *self.authors)
+        # а подписку author2 - удалить
+        followed = {author.pk for author in self.authors}
+        with mock.patch('posts.follows._followed_ids',
+                        return_value=followed):
+            result = unfollow_authors(
+                self.reader, ['author1', 'author2'])
+        self.assertEqual(result['changed'], 1)
+        self.assertStatsConsistent(self.reader, *self.authors)
+        self.assertTrue(
+            follow_graph.is_following(self.reader.pk, self.authors[0].pk))
+
+    def test_get_is_not_allowed(self):
+        response = self.client.get(reverse('post:follow_many'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_thousand_authors_in_batches(self):
+        User.objects.bulk_create(
+            User(username=f'many{i}') for i in range(1000))
+        usernames = [f'many{i}' for i in range(1000)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('post:follow_many'), {
+                'authors': ' '.join(usernames)})
+        self.assertEqual(response.json()['changed'], 1000)
+        # пачки, а не запросы на каждого автора
+        self.assertLess(len(queries), 40)
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 1001)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.reader).following_count, 1001)
+
+    def test_command_reads_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as names:
+            names.write('author1\nauthor2\n')
+            names.flush()
+            call_command('follow_authors', 'reader', '--file', names.name,
+                         stdout=StringIO())
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 3)
+        call_command('follow_authors', 'reader', 'author0', '--unfollow',
+                     stdout=StringIO())
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 2)
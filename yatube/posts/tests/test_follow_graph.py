@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import (Client, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import follow_graph
+from ..caching import bump_generation
+from ..follow_graph import CHANGE_KEY, FOLLOW_GRAPH_KEY, FollowGraph
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+class FollowGraphStructureTest(SimpleTestCase):
+    def test_contains_and_sorted_authors(self):
+        rng = random.Random(0)
+        pairs = sorted({
+            (rng.randrange(50), rng.randrange(500)) for _ in range(3000)})
+        graph = FollowGraph(pairs)
+        edges = set(pairs)
+        for user_id in range(50):
+            for author_id in range(500):
+                self.assertEqual(
+                    graph.contains(user_id, author_id),
+                    (user_id, author_id) in edges)
+        self.assertEqual(
+            list(graph.authors(7)),
+            sorted(author for user, author in edges if user == 7))
+
+    def test_changes_grow_the_filter(self):
+        graph = FollowGraph()
+        for author_id in range(1000, 0, -1):
+            graph.add(1, author_id)
+        graph.add(1, 5)
+        self.assertEqual(list(graph.authors(1)), list(range(1, 1001)))
+        self.assertGreaterEqual(graph.bloom.capacity, graph.edges)
+        graph.remove(1, 5)
+        graph.remove(2, 5)
+        self.assertFalse(graph.contains(1, 5))
+        self.assertTrue(graph.contains(1, 6))
+        self.assertEqual(graph.edges, 999)
+
+    def test_filter_is_swapped_in_when_complete(self):
+        graph = FollowGraph([(1, 2)])
+        fill = follow_graph.BloomFilter.update
+
+        def concurrent_check(bloom, pairs):
+            # проверка из другого потока посреди перестройки фильтра
+            self.assertTrue(graph.contains(1, 2))
+            fill(bloom, pairs)
+
+        with mock.patch.object(follow_graph.BloomFilter, 'update',
+                               concurrent_check):
+            graph._build_bloom()
+        self.assertTrue(graph.contains(1, 2))
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.other = User.objects.create(username='other')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_graph_follows_signals(self):
+        reader, author, other = self.reader.pk, self.author.pk, self.other.pk
+        self.assertEqual(follow_graph.following(reader), [author])
+        with self.assertNumQueries(0):
+            self.assertFalse(follow_graph.is_following(reader, other))
+        Follow.objects.create(user=self.reader, author=self.other)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(reader, other))
+            self.assertFalse(follow_graph.is_following(reader, author))
+            self.assertEqual(follow_graph.following(reader), [other])
+
+    def test_rolled_back_follow_is_forgotten(self):
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=self.reader, author=self.other)
+                self.assertTrue(
+                    follow_graph.is_following(self.reader.pk, self.other.pk))
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(
+            follow_graph.is_following(self.reader.pk, self.other.pk))
+
+    def test_feed_pages_do_not_query_follows(self):
+        addresses = [
+            reverse('post:profile', kwargs={'username': 'author'}),
+            reverse('post:follow_index'),
+        ]
+        follow_graph.following(self.reader.pk)
+        for address in addresses:
+            with self.subTest(address=address):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(address)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(any(
+                    'posts_follow' in query['sql'] for query in queries))
+        self.assertEqual(len(response.context['page_obj']), 1)
+
+
+class ReloadTest(SimpleTestCase):
+    def test_concurrent_threads_load_graph_once(self):
+        follow_graph.invalidate()
+        loads = []
+
+        def slow_load():
+            loads.append(1)
+            time.sleep(0.05)
+            return FollowGraph([(1, 2)])
+
+        with mock.patch('posts.follow_graph._load', slow_load):
+            threads = [
+                threading.Thread(target=follow_graph.is_following,
+                                 args=(1, 2))
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(loads), 1)
+        follow_graph.invalidate()
+
+
+@override_settings(FOLLOW_GRAPH_SYNC_INTERVAL=0)
+class SharedFollowGraphTest(TransactionTestCase):
+    def test_committed_changes_update_loaded_graph(self):
+        reader = User.objects.create(username='reader')
+        author = User.objects.create(username='author')
+        follow_graph.invalidate()
+        with self.assertNumQueries(1):
+            self.assertFalse(follow_graph.is_following(reader.pk, author.pk))
+        Follow.objects.create(user=reader, author=author)
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(reader.pk, author.pk))
+        with transaction.atomic():
+            Follow.objects.filter(user=reader, author=author).delete()
+        with self.assertNumQueries(0):
+            self.assertFalse(follow_graph.is_following(reader.pk, author.pk))
+
+    def publish(self, added=(), removed=()):
+        """Изменение из другого процесса: строки и запись в журнале."""
+        number = bump_generation(FOLLOW_GRAPH_KEY)
+        cache.set(CHANGE_KEY.format(number), (list(added), list(removed)))
+
+    def test_other_processes_changes_are_applied_from_log(self):
+        reader = User.objects.create(username='reader')
+        author = User.objects.create(username='author')
+        follow_graph.invalidate()
+        follow_graph.is_following(reader.pk, author.pk)
+        Follow.objects.bulk_create([Follow(user=reader, author=author)])
+        self.publish(added=[(reader.pk, author.pk)])
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(reader.pk, author.pk))
+        # журнал неполон: граф перечитывается из базы
+        bump_generation(FOLLOW_GRAPH_KEY)
+        with self.assertNumQueries(1):
+            self.assertTrue(follow_graph.is_following(reader.pk, author.pk))
+
+    def test_generation_is_checked_once_per_interval(self):
+        follow_graph.invalidate()
+        follow_graph.is_following(1, 2)
+        self.publish(added=[(1, 2)])
+        with override_settings(FOLLOW_GRAPH_SYNC_INTERVAL=60):
+            with mock.patch('posts.follow_graph.generation') as generation:
+                self.assertFalse(follow_graph.is_following(1, 2))
+        generation.assert_not_called()
+        self.assertTrue(follow_graph.is_following(1, 2))
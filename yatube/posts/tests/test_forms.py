@@ -1,11 +1,17 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Group, Post
 
@@ -13,6 +19,11 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+def jpeg_name(uploaded):
+    uploaded.seek(0)
+    return hashlib.sha256(uploaded.read()).hexdigest() + '.jpg'
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostCreateFormTests(TestCase):
     @classmethod
@@ -130,7 +141,8 @@ class PostCreateFormTests(TestCase):
                 pk=expected_count_posts,
                 text=form_data['text'],
                 author=self.author,
-                image=self.folder_for_pics + str(form_data['image'])
+                # картинка сохраняется в JPEG под именем из хеша загрузки
+                image=self.folder_for_pics + jpeg_name(form_data['image'])
             ).exists()
         )
 
@@ -153,10 +165,53 @@ class PostCreateFormTests(TestCase):
                 pk=self.first_post.pk,
                 text=form_data['text'],
                 author=self.author,
-                image=self.folder_for_pics + str(form_data['image'])
+                # картинка сохраняется в JPEG под именем из хеша загрузки
+                image=self.folder_for_pics + jpeg_name(form_data['image'])
             ).exists()
         )
 
+    @override_settings(IMAGE_MAX_SIZE=100)
+    def test_form_normalizes_uploaded_picture(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Phone maker'
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200), (255, 0, 0)).save(
+            buffer, 'JPEG', exif=exif)
+        form_data = {
+            'text': 'Big picture',
+            'image': SimpleUploadedFile(
+                name='big.jpg',
+                content=buffer.getvalue(),
+                content_type='image/jpeg'
+            ),
+        }
+        self.authorized_author.post(
+            reverse('post:post_create'), data=form_data)
+        post = Post.objects.get(text=form_data['text'])
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (100, 50))
+            self.assertNotIn('exif', stored.info)
+            self.assertTrue(stored.info.get('progressive'))
+
+    def test_form_rejects_truncated_picture(self):
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200), (255, 0, 0)).save(
+            buffer, 'JPEG', quality=95)
+        expected_count_posts = Post.objects.count()
+        response = self.authorized_author.post(
+            reverse('post:post_create'), data={
+                'text': 'Broken picture',
+                'image': SimpleUploadedFile(
+                    name='broken.jpg',
+                    content=buffer.getvalue()[:len(buffer.getvalue()) // 2],
+                    content_type='image/jpeg'
+                ),
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].has_error('image'))
+        self.assertEqual(Post.objects.count(), expected_count_posts)
+
     def test_form_add_comment(self):
         pk = self.first_post.pk
         expected_count_com = self.first_post.comments.count() + 1
@@ -183,3 +238,53 @@ class PostCreateFormTests(TestCase):
             author=self.author,
         )
         self.assertTrue(list(comment)[0] in list(response.context['comments']))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageDeduplicationTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.authorized_author = Client()
+        self.authorized_author.force_login(self.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, text, name):
+        buffer = BytesIO()
+        Image.new('RGB', (20, 10), (0, 0, 255)).save(buffer, 'PNG')
+        self.authorized_author.post(reverse('post:post_create'), data={
+            'text': text,
+            'image': SimpleUploadedFile(
+                name=name,
+                content=buffer.getvalue(),
+                content_type='image/png'
+            ),
+        })
+        return Post.objects.get(text=text)
+
+    def test_same_picture_shared_until_last_post_removed(self):
+        first = self.create_post('first', 'one.png')
+        second = self.create_post('second', 'two.png')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            (second.image_width, second.image_height), (20, 10))
+        storage = first.image.storage
+        first.delete()
+        self.assertTrue(storage.exists(second.image.name))
+        second.delete()
+        self.assertFalse(storage.exists(second.image.name))
+
+    def test_orphan_is_deleted_under_write_lock(self):
+        post = self.create_post('only', 'one.png')
+        locked = []
+        with mock.patch(
+                'posts.images.delete_with_thumbnails',
+                side_effect=lambda name: locked.append(
+                    connection.in_atomic_block)):
+            post.delete()
+        # jpeg и, если Pillow умеет, webp
+        self.assertTrue(locked)
+        self.assertTrue(all(locked))
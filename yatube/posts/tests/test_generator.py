@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from ..counters import recount
+from ..generator import Generator
+from ..models import AuthorStats, Comment, Follow, Post, TimelineEntry
+from ..search import SearchResults
+
+
+def schema_objects():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master '
+            "WHERE type IN ('index', 'trigger')")
+        return {name for name, in cursor.fetchall()}
+
+
+class GeneratorTest(TestCase):
+    def generate(self, prefix='gen', seed=1):
+        return Generator(
+            prefix=prefix, seed=seed, users=20, groups=3, posts=200,
+            comments=300, follows=100, batch_size=64).run()
+
+    def test_rows_and_denormalized_data(self):
+        before = schema_objects()
+        created = self.generate()
+        self.assertEqual(schema_objects(), before)
+        self.assertEqual(created['posts'], Post.objects.count())
+        self.assertEqual(created['comments'], Comment.objects.count())
+        self.assertEqual(created['follows'], Follow.objects.count())
+        for stats in AuthorStats.objects.select_related('user'):
+            fresh = recount(stats.user)
+            self.assertEqual(
+                (stats.posts_count, stats.followers_count,
+                 stats.following_count),
+                (fresh.posts_count, fresh.followers_count,
+                 fresh.following_count))
+        post = Post.objects.order_by('-comment_count').first()
+        self.assertEqual(post.comment_count, post.comments.count())
+        self.assertEqual(post.text_as_html, post.text_html)
+        expected = Post.objects.filter(
+            author__following__isnull=False).count()
+        self.assertEqual(TimelineEntry.objects.count(), expected)
+        self.assertEqual(created['timeline_entries'], expected)
+        word = post.text.split()[1]
+        self.assertGreater(SearchResults(word).count(), 0)
+
+    def test_same_seed_same_data(self):
+        self.generate('first')
+        self.generate('second')
+        first, second = (
+            list(Post.objects.filter(
+                author__username__startswith=prefix).order_by('pk')
+                .values_list('text', 'group__slug', 'pub_date'))
+            for prefix in ('first-', 'second-'))
+        self.assertEqual(
+            [text for text, _, _ in first], [text for text, _, _ in second])
+        self.assertEqual(
+            [slug.split('-')[1] if slug else None for _, slug, _ in first],
+            [slug.split('-')[1] if slug else None for _, slug, _ in second])
+
+    def test_command_refuses_existing_prefix(self):
+        call_command('generate_data', users=5, posts=10, comments=5,
+                     follows=5, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('generate_data', users=5, posts=10)
@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..loaders import loader
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+def selects_from(queries, table):
+    return sum(
+        f'FROM "{table}"' in query['sql'] for query in queries)
+
+
+class RequestLoaderTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Post.objects.create(text='Пост', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_objects_are_loaded_once(self):
+        request = RequestFactory().get('/')
+        request.user = self.reader
+        with self.assertNumQueries(2):
+            author = loader(request).user('author')
+            self.assertIs(loader(request).user('author'), author)
+            self.assertIsNone(loader(request).user('nobody'))
+            self.assertIsNone(loader(request).user('nobody'))
+        with self.assertNumQueries(0):
+            self.assertIs(loader(request).user('reader'), self.reader)
+        with self.assertNumQueries(1):
+            group = loader(request).group('group')
+            self.assertIs(loader(request).group('group'), group)
+
+    def test_profile_loads_users_once(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        address = reverse('post:profile', kwargs={'username': 'author'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(address)
+        self.assertTrue(response.context['following'])
+        # вошедший пользователь из сессии и автор страницы
+        self.assertEqual(selects_from(queries, 'auth_user'), 2)
+        # граф подписок читается из базы не больше одного раза
+        self.assertLessEqual(selects_from(queries, 'posts_follow'), 1)
+
+    def test_own_profile_reuses_request_user(self):
+        address = reverse('post:profile', kwargs={'username': 'reader'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(address)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(selects_from(queries, 'auth_user'), 1)
+
+    def test_group_is_loaded_once(self):
+        address = reverse('post:group_list', kwargs={'slug': 'group'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(address)
+        self.assertEqual(response.context['group'], self.group)
+        self.assertEqual(selects_from(queries, 'posts_group'), 1)
+
+    def test_follow_views_reuse_request_user(self):
+        addresses = [
+            reverse('post:follow_index'),
+            reverse('post:profile_follow', kwargs={'username': 'reader'}),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(address)
+                self.assertEqual(selects_from(queries, 'auth_user'), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse(
+                'post:profile_follow', kwargs={'username': 'author'}))
+        self.assertEqual(selects_from(queries, 'auth_user'), 2)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+
+    def test_missing_objects_are_not_found(self):
+        addresses = [
+            reverse('post:profile', kwargs={'username': 'nobody'}),
+            reverse('post:group_list', kwargs={'slug': 'nothing'}),
+            reverse('post:profile_follow', kwargs={'username': 'nobody'}),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                self.assertEqual(self.client.get(address).status_code, 404)
@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.template.loader import render_to_string
 from django.test import TestCase
 
 from ..models import Group, Post
+from ..rendering import RENDERER_VERSION
 
 User = get_user_model()
 
@@ -55,3 +60,40 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     self.post._meta.get_field(field).help_text, expected_value)
+
+
+class PostTextHtmlTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_html_is_rendered_on_save(self):
+        post = Post.objects.create(author=self.user, text='<b>раз</b>\n\nдва')
+        self.assertEqual(
+            post.text_html, '<p>&lt;b&gt;раз&lt;/b&gt;</p>\n\n<p>два</p>')
+        self.assertEqual(post.text_html_version, RENDERER_VERSION)
+        post.text = 'три'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text_as_html, '<p>три</p>')
+
+    def test_stale_html_is_not_shown_and_can_be_rerendered(self):
+        post = Post.objects.create(author=self.user, text='текст')
+        Post.objects.filter(pk=post.pk).update(
+            text_html='<p>старый</p>', text_html_version=0)
+        post.refresh_from_db()
+        self.assertEqual(post.text_as_html, '<p>текст</p>')
+        call_command('render_posts', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, '<p>текст</p>')
+        self.assertEqual(post.text_html_version, RENDERER_VERSION)
+
+    def test_stale_html_is_escaped_once_in_templates(self):
+        post = Post.objects.create(author=self.user, text='a<b')
+        Post.objects.filter(pk=post.pk).update(text_html_version=0)
+        post.refresh_from_db()
+        html = render_to_string(
+            'posts/includes/post_card.html', {'post': post})
+        self.assertIn('<p>a&lt;b</p>', html)
+        self.assertNotIn('<p><p>', html.replace('\n', '').replace(' ', ''))
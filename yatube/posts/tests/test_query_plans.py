@@ -0,0 +1,73 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# полный проход по таблице без индекса и сортировка во временном B-дереве
+BAD_PLAN = re.compile(r'^SCAN (TABLE )?\w+$|USE TEMP B-TREE')
+
+
+class QueryPlanTest(TestCase):
+    """EXPLAIN QUERY PLAN для всех SELECT, которые выполняют ленты."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test_group',
+            description='This is test group'
+        )
+        for i in range(15):
+            Post.objects.create(
+                text='Simple text-' + str(i + 1),
+                author=cls.author,
+                group=cls.group,
+            )
+        cls.post = Post.objects.first()
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='comment')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.reader)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_plans_use_indexes(self, address):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(address)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            for step in self.explain(sql):
+                self.assertIsNone(
+                    BAD_PLAN.search(step), f'{step}\n{sql}')
+
+    def test_feed_queries_use_indexes(self):
+        page = self.authorized_client.get(reverse('post:index'))
+        next_cursor = page.context['page_obj'].paginator.next_cursor
+        addresses = [
+            reverse('post:index'),
+            reverse('post:index') + f'?cursor={next_cursor}',
+            reverse('post:group_list', kwargs={'slug': self.group.slug}),
+            reverse('post:profile', kwargs={'username': self.author}),
+            reverse('post:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('post:follow_index'),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                self.assert_plans_use_indexes(address)
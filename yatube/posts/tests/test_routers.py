@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections, router
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import AuthorStats, Post
+from ..routers import STICKY_KEY, replica_middleware
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        Post.objects.create(author=self.author, text='Пост с реплики')
+        self.add_replica()
+        # реплика отстаёт: этого поста на ней ещё нет
+        Post.objects.create(author=self.author, text='Пост после снимка')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def add_replica(self):
+        """Вторая база-снимок основной вместо настоящей реплики."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'replica.sqlite3')
+        connection.ensure_connection()
+        with sqlite3.connect(path) as target:
+            connection.connection.backup(target)
+        target.close()
+        connections.databases['replica'] = {
+            **connection.settings_dict,
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path,
+        }
+        self.addCleanup(self.remove_replica)
+
+    def remove_replica(self):
+        connections['replica'].close()
+        del connections.databases['replica']
+        delattr(connections._connections, 'replica')
+
+    def index_texts(self, client):
+        response = client.get(reverse('post:index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_feed_reads_go_to_replica(self):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            texts = self.index_texts(Client())
+        self.assertEqual(texts, ['Пост с реплики'])
+        self.assertTrue(replica.captured_queries)
+
+    def test_search_matches_on_the_same_replica(self):
+        response = Client().get(reverse('post:search'), {'q': 'пост'})
+        page = response.context['page_obj']
+        self.assertEqual(page.paginator.count, 1)
+        self.assertEqual(
+            [post.text for post in page], ['Пост с реплики'])
+
+    def test_writer_reads_own_writes(self):
+        self.authorized_client.post(
+            reverse('post:post_create'), {'text': 'Свежий пост'})
+        self.assertEqual(
+            Post.objects.using('default').filter(text='Свежий пост').count(),
+            1)
+        self.assertIn('Свежий пост', self.index_texts(self.authorized_client))
+        self.assertNotIn('Свежий пост', self.index_texts(Client()))
+
+    @override_settings(REPLICA_STICKY_SECONDS=0)
+    def test_stickiness_expires(self):
+        self.authorized_client.post(
+            reverse('post:post_create'), {'text': 'Свежий пост'})
+        self.assertNotIn(
+            'Свежий пост', self.index_texts(self.authorized_client))
+
+    def test_safe_request_writes_do_not_stick(self):
+        def view(request):
+            # служебная запись, например пересчёт счётчиков автора
+            AuthorStats.objects.filter(user=self.author).update(
+                posts_count=2)
+            return HttpResponse()
+
+        for method, sticks in [('get', False), ('post', True)]:
+            with self.subTest(method=method):
+                request = getattr(RequestFactory(), method)('/')
+                request.session = {}
+                replica_middleware(view)(request)
+                self.assertEqual(STICKY_KEY in request.session, sticks)
+
+    def test_follow_on_get_sticks(self):
+        reader = User.objects.create(username='reader')
+        client = Client()
+        client.force_login(reader)
+        client.get(reverse(
+            'post:profile_follow', kwargs={'username': 'author'}))
+        self.assertIn(STICKY_KEY, client.session.keys())
+
+    def test_replica_connection_is_read_only(self):
+        with connections['replica'].cursor() as cursor:
+            cursor.execute('PRAGMA query_only')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_writes_stay_on_primary(self):
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+        self.assertTrue(router.allow_migrate('default', 'posts'))
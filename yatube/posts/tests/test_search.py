@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..search import missing_triggers, restore_triggers
+
+User = get_user_model()
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.post_about_cats = Post.objects.create(
+            text='Коты спят <b>весь</b> день', author=cls.author)
+        cls.post_about_dogs = Post.objects.create(
+            text='Собаки любят гулять', author=cls.author)
+        cls.guest_client = Client()
+
+    def search(self, query):
+        return self.guest_client.get(reverse('post:search'), {'q': query})
+
+    def test_search_finds_post_by_prefix_with_highlight(self):
+        response = self.search('кот')
+        self.assertEqual(
+            list(response.context['page_obj']), [self.post_about_cats])
+        self.assertContains(response, '<mark>Коты</mark>')
+        # текст поста экранируется, подсвечиваются только совпадения
+        self.assertContains(response, '&lt;b&gt;весь&lt;/b&gt;')
+
+    def test_search_follows_post_and_comment_changes(self):
+        Comment.objects.create(
+            post=self.post_about_dogs, author=self.author,
+            text='а ещё грызут тапки')
+        response = self.search('тапки')
+        self.assertEqual(
+            list(response.context['page_obj']), [self.post_about_dogs])
+        Post.objects.filter(pk=self.post_about_cats.pk).update(
+            text='Кошки и тапки')
+        response = self.search('тапки')
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.post_about_cats.delete()
+        response = self.search('кошки')
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_comments_are_indexed_as_separate_rows(self):
+        comments = [
+            Comment.objects.create(
+                post=self.post_about_dogs, author=self.author,
+                text=f'комментарий {word}')
+            for word in ['мячик', 'палка']]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid, text FROM posts_search WHERE post_id = %s',
+                [self.post_about_dogs.pk])
+            rows = dict(cursor.fetchall())
+        self.assertEqual(rows, {
+            self.post_about_dogs.pk: self.post_about_dogs.text,
+            -comments[0].pk: 'комментарий мячик',
+            -comments[1].pk: 'комментарий палка',
+        })
+        comments[0].delete()
+        response = self.search('комментарий')
+        self.assertEqual(
+            list(response.context['page_obj']), [self.post_about_dogs])
+        self.assertContains(response, '<mark>комментарий</mark> палка')
+        self.assertEqual(len(self.search('мячик').context['page_obj']), 0)
+
+    def test_triggers_exist_after_migrate(self):
+        self.assertEqual(missing_triggers(connection), [])
+
+    def test_lost_triggers_are_restored(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_search_post_insert')
+        restore_triggers(connection)
+        self.assertEqual(missing_triggers(connection), [])
+        post = Post.objects.create(text='Хомяки', author=self.author)
+        self.assertEqual(
+            list(self.search('хомяки').context['page_obj']), [post])
+
+    def test_search_operators_are_not_interpreted(self):
+        for query in ['"', 'NOT', 'кот OR', '*', '']:
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query).status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собаки'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post_about_dogs])
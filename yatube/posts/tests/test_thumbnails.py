@@ -0,0 +1,59 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..thumbnails import THUMBNAIL_SIZES, generate_thumbnails, ready_thumbnail
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ReadyThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.post = Post.objects.create(
+            text='Text and picture',
+            author=cls.author,
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif')
+        )
+        cls.client_guest = Client()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        address = reverse('post:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client_guest.get(address)
+        self.assertContains(response, 'thumbnail_placeholder.svg')
+        generate_thumbnails(self.post.image.name)
+        for geometry_string, options in THUMBNAIL_SIZES:
+            with self.subTest(geometry_string=geometry_string):
+                self.assertIsNotNone(ready_thumbnail(
+                    self.post.image, geometry_string, **options))
+        response = self.client_guest.get(address)
+        self.assertNotContains(response, 'thumbnail_placeholder.svg')
+
+    def test_no_thumbnail_for_post_without_image(self):
+        post = Post.objects.create(text='Text only', author=self.author)
+        self.assertIsNone(ready_thumbnail(post.image, 'x200'))
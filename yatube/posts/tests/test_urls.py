@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
@@ -39,6 +40,9 @@ class PostURLTests(TestCase):
         cls.authorized_client = Client()
         cls.authorized_client.force_login(cls.authorized_author)
 
+    def setUp(self):
+        cache.clear()
+
     def test_urls_exists_anonymous_user(self):
         check_urls = {
             reverse('post:index'): HTTPStatus.OK,
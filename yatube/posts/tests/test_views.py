@@ -4,11 +4,15 @@ import tempfile
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post
+from ..query_budget import QueryBudgetExceeded, query_budget
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -34,6 +38,9 @@ class PostPagesTests(TestCase):
         cls.authorized_author = Client()
         cls.authorized_author.force_login(cls.author)
 
+    def setUp(self):
+        cache.clear()
+
     def test_pages_uses_correct_template(self):
         templates_pages_names = {
             reverse('post:index'): 'posts/index.html',
@@ -136,6 +143,28 @@ class PostPagesTests(TestCase):
             list_posts_context = response.context['page_obj'].object_list
             self.assertNotEqual(list_posts_context[0], seek_post)
 
+    def test_post_detail_fixed_query_budget(self):
+        """post, author and comments are loaded by a constant number."""
+        address = reverse('post:post_detail',
+                          kwargs={'post_id': self.first_post.pk})
+        guest_client = Client()
+        Comment.objects.create(
+            post=self.first_post, author=self.author, text='comment')
+        with CaptureQueriesContext(connection) as one_comment:
+            guest_client.get(address)
+        for i in range(30):
+            commentator = User.objects.create(username=f'commentator{i}')
+            Comment.objects.create(
+                post=self.first_post, author=commentator, text='comment')
+        with CaptureQueriesContext(connection) as many_comments:
+            response = guest_client.get(address)
+        self.assertEqual(len(one_comment), len(many_comments))
+        self.assertEqual(len(response.context['comments']), 20)
+        self.assertEqual(response.context['author_stats'].posts_count, 13)
+        response = guest_client.get(address, {
+            'cursor': response.context['comments'].paginator.next_cursor})
+        self.assertEqual(len(response.context['comments']), 11)
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -180,6 +209,9 @@ class PaginatorViewsTest(TestCase):
         cls.authorized_author = Client()
         cls.authorized_author.force_login(cls.author)
 
+    def setUp(self):
+        cache.clear()
+
     def test_paginator(self):
         """main page, posts of one group, posts of one author."""
         reverse_paginator = {
@@ -200,6 +232,38 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(
                     len(response.context['page_obj']), amout_post_on2page)
 
+    def test_cursor_paginator(self):
+        """next/previous cursors walk the feed without COUNT(*)."""
+        address = reverse('post:group_list',
+                          kwargs={'slug': self.test_group.slug})
+        response = self.authorized_author.get(address)
+        first_page = list(response.context['page_obj'].object_list)
+        next_cursor = response.context['page_obj'].paginator.next_cursor
+        self.assertFalse(response.context['page_obj'].has_previous())
+        self.assertEqual(
+            first_page,
+            list(self.test_group.posts.order_by('-pub_date')[:10]))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_author.get(
+                address, {'cursor': next_cursor})
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries))
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), self.nums_group - self.nums_paginator)
+        self.assertFalse(page_obj.has_next())
+        self.assertTrue(page_obj.has_previous())
+        response = self.authorized_author.get(
+            address, {'cursor': page_obj.paginator.previous_cursor})
+        self.assertListEqual(
+            first_page, list(response.context['page_obj'].object_list))
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.authorized_author.get(
+            reverse('post:index'), {'cursor': 'broken'})
+        self.assertEqual(
+            len(response.context['page_obj']), self.nums_paginator)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
 
 # Для сохранения media-файлов в тестах будет использоваться
 # временная папка TEMP_MEDIA_ROOT, а потом мы ее удалим
@@ -246,6 +310,9 @@ class ShowPicturesTest(TestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self):
+        cache.clear()
+
     def test_pictures_on_pages_list_posts(self):
         reverse_context = {
             reverse('post:index'):
@@ -271,3 +338,112 @@ class ShowPicturesTest(TestCase):
             'post:post_detail', kwargs={'post_id': passed_post.id})
         response = self.authorized_author.get(adress)
         self.assertEqual(passed_post.image, response.context['post'].image)
+
+
+class TemplateTimingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test_group',
+            description='This is test group'
+        )
+        for i in range(3):
+            Post.objects.create(
+                text='Simple text-' + str(i + 1),
+                author=cls.author,
+                group=cls.group,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_group_list_reuses_post_card(self):
+        response = self.client.get(
+            reverse('post:group_list', kwargs={'slug': self.group.slug}))
+        self.assertTemplateUsed(response, 'posts/includes/post_card.html')
+        self.assertContains(response, 'Simple text-', count=3)
+
+    def test_render_times_are_reported(self):
+        templates = [{
+            **settings.TEMPLATES[0],
+            'APP_DIRS': False,
+            'OPTIONS': {
+                **settings.TEMPLATES[0]['OPTIONS'],
+                'loaders': [('posts.template_timing.Loader', [
+                    ('django.template.loaders.cached.Loader', [
+                        'django.template.loaders.filesystem.Loader',
+                        'django.template.loaders.app_directories.Loader',
+                    ]),
+                ])],
+            },
+        }]
+        middleware = settings.MIDDLEWARE + [
+            'posts.template_timing.template_timing_middleware']
+        with override_settings(TEMPLATES=templates, MIDDLEWARE=middleware):
+            response = self.client.get(
+                reverse('post:group_list', kwargs={'slug': self.group.slug}))
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        for name in ['posts/group_list.html x1', 'base.html x1',
+                     'posts/includes/post_card.html x3']:
+            with self.subTest(name=name):
+                self.assertIn(f'desc="{name}"', timing)
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test_group',
+            description='This is test group'
+        )
+        for i in range(12):
+            cls.post = Post.objects.create(
+                text='Simple text-' + str(i + 1),
+                author=cls.author,
+                group=cls.group,
+            )
+        for i in range(25):
+            commentator = User.objects.create(username=f'commentator{i}')
+            Comment.objects.create(
+                post=cls.post, author=commentator, text='comment')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.addresses = [
+            reverse('post:index'),
+            reverse('post:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('post:profile', kwargs={'username': cls.author}),
+            reverse('post:post_detail', kwargs={'post_id': cls.post.pk}),
+            reverse('post:follow_index'),
+            reverse('post:post_create'),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    @query_budget({})
+    def test_pages_fit_their_budgets(self):
+        for address in self.addresses:
+            with self.subTest(address=address):
+                response = self.authorized_client.get(address)
+                self.assertEqual(response.status_code, 200)
+
+    @query_budget({'post:index': 1})
+    def test_strict_mode_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.authorized_client.get(reverse('post:index'))
+
+    @override_settings(QUERY_BUDGETS={'post:index': 1})
+    def test_offenders_are_logged(self):
+        with self.assertLogs('posts.query_budget', 'WARNING') as logs:
+            response = self.authorized_client.get(reverse('post:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('post:index /: ', logs.output[0])
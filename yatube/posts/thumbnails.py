@@ -0,0 +1,97 @@
+"""Заранее подготовленные миниатюры картинок постов.
+
+Миниатюры всех размеров, которые используют шаблоны, строятся после
+сохранения поста в фоновом потоке. Шаблоны только ищут готовую
+миниатюру в key-value хранилище sorl и, если её ещё нет, показывают
+заглушку, а не декодируют картинку посреди запроса.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from .caching import bump_feed_generation
+
+logger = logging.getLogger(__name__)
+
+# размеры из шаблонов: ленты и страница поста
+THUMBNAIL_SIZES = (
+    ('x200', {}),
+    ('200', {'crop': 'center', 'upscale': True}),
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.THUMBNAIL_WORKERS,
+    thread_name_prefix='thumbnails',
+)
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который только ищет миниатюру и ничего не строит."""
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        # имя миниатюры считается так же, как в ThumbnailBackend
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = ReadyThumbnailBackend()
+
+
+def ready_thumbnail(image, geometry_string, **options):
+    """Готовая миниатюра или None."""
+    if not image:
+        return None
+    return backend.get_ready_thumbnail(image, geometry_string, **options)
+
+
+def generate_thumbnails(image_name):
+    """Строит миниатюры всех размеров для картинки из хранилища."""
+    try:
+        for geometry_string, options in THUMBNAIL_SIZES:
+            get_thumbnail(image_name, geometry_string, **options)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры %s', image_name)
+    else:
+        # страницы и фрагменты с заглушкой вместо миниатюры устарели
+        bump_feed_generation()
+
+
+def _generate_in_worker(image_name):
+    try:
+        generate_thumbnails(image_name)
+    finally:
+        # у каждого потока своё соединение с базой
+        connection.close()
+
+
+def _in_memory_sqlite():
+    # потоки делят такую базу с блокировкой таблиц и без ожидания
+    return connection.vendor == 'sqlite' and connection.is_in_memory_db()
+
+
+def schedule_thumbnails(post):
+    """Ставит построение миниатюр поста в очередь после коммита."""
+    if not post.image:
+        return
+    image_name = post.image.name
+    if settings.THUMBNAIL_ASYNC and not _in_memory_sqlite():
+        transaction.on_commit(
+            lambda: _executor.submit(_generate_in_worker, image_name))
+    else:
+        transaction.on_commit(lambda: generate_thumbnails(image_name))
@@ -0,0 +1,234 @@
+"""Материализованные ленты подписок (fan-out-on-write).
+
+Новый пост раскладывается в ленты всех подписчиков автора, поэтому
+страница подписок читает только свою ленту. Посты авторов, у которых
+подписчиков больше settings.TIMELINE_FANOUT_LIMIT, не раскладываются:
+тем, кто подписан на таких авторов, лента собирается при чтении
+(fan-out-on-read).
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+
+from . import follow_graph
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .utils import IN_LIMIT, chunks
+
+BATCH_SIZE = 500
+
+
+def followers_count(author_id):
+    # счётчики обновляются сигналами раньше, чем ленты
+    return AuthorStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first() or 0
+
+
+def is_fanout_author(author_id):
+    return followers_count(author_id) <= settings.TIMELINE_FANOUT_LIMIT
+
+
+def _push(user_ids, posts):
+    """posts - пары (id, pub_date)."""
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for user_id in user_ids for post_id, pub_date in posts
+    ]
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Кладёт новый пост в ленты подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _push(follower_ids, [(post.pk, post.pub_date)])
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту пользователя посты нового избранного автора."""
+    if not is_fanout_author(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    _push([user_id], posts)
+
+
+BACKFILL_SQL = '''
+{insert} {timeline} (user_id, post_id, pub_date)
+SELECT %s, post.id, post.pub_date
+FROM {post} post
+JOIN {stats} stats ON stats.user_id = post.author_id
+WHERE post.author_id IN ({authors}) AND stats.followers_count <= %s
+{suffix}'''
+
+
+def backfill_authors(user_id, author_ids):
+    """backfill() для многих новых избранных авторов разом.
+
+    Одним INSERT ... SELECT на пачку авторов; счётчики подписчиков
+    должны быть уже обновлены.
+    """
+    ops = connection.ops
+    for chunk in chunks(author_ids):
+        sql = BACKFILL_SQL.format(
+            insert=ops.insert_statement(ignore_conflicts=True),
+            timeline=TimelineEntry._meta.db_table,
+            post=Post._meta.db_table,
+            stats=AuthorStats._meta.db_table,
+            authors=', '.join(['%s'] * len(chunk)),
+            suffix=ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql,
+                [user_id, *chunk, settings.TIMELINE_FANOUT_LIMIT])
+
+
+def _refill(author_id):
+    follower_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    _push(follower_ids, posts)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+    # автор мог опуститься ниже порога: его посты снова раскладываются
+    # по лентам, поэтому дозаполняем ленты оставшихся подписчиков
+    if followers_count(author_id) == settings.TIMELINE_FANOUT_LIMIT:
+        _refill(author_id)
+
+
+def prune_authors(user_id, author_ids):
+    """prune() для многих авторов разом."""
+    for chunk in chunks(author_ids):
+        TimelineEntry.objects.filter(
+            user_id=user_id, post__author_id__in=chunk).delete()
+        for author_id in AuthorStats.objects.filter(
+            user_id__in=chunk,
+            followers_count=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('user_id', flat=True):
+            _refill(author_id)
+
+
+class MergedFeed:
+    """Непересекающиеся ленты, слитые по ключу сортировки.
+
+    Умеет то, что нужно пагинаторам из posts/utils.py: filter, order_by,
+    select_related применяются к каждой ленте, count складывается, а срез
+    [start:stop] читает из каждой ленты не больше stop строк и сливает
+    их в памяти.
+    """
+    ordered = True
+
+    def __init__(self, *querysets):
+        self.querysets = querysets
+
+    def _each(self, method, *args, **kwargs):
+        return MergedFeed(*(
+            getattr(queryset, method)(*args, **kwargs)
+            for queryset in self.querysets))
+
+    def filter(self, *args, **kwargs):
+        return self._each('filter', *args, **kwargs)
+
+    def order_by(self, *fields):
+        return self._each('order_by', *fields)
+
+    def select_related(self, *fields):
+        return self._each('select_related', *fields)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        rows = []
+        for queryset in self.querysets:
+            rows.extend(queryset[:index.stop])
+        fields = self.querysets[0].query.order_by
+        rows.sort(
+            key=attrgetter(*(field.lstrip('-') for field in fields)),
+            reverse=fields[0].startswith('-'))
+        return rows[index.start or 0:index.stop]
+
+    def __iter__(self):
+        return iter(self[:None])
+
+
+def _popular(user, authors):
+    """id авторов из подписок user, чьи посты не раскладываются."""
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    if len(authors) > IN_LIMIT:
+        popular = Follow.objects.filter(
+            user=user, author__stats__followers_count__gt=limit,
+        ).values_list('author_id', flat=True)
+    else:
+        popular = AuthorStats.objects.filter(
+            user_id__in=authors, followers_count__gt=limit,
+        ).values_list('user_id', flat=True)
+    return list(popular)
+
+
+def timeline_posts(user):
+    """Посты ленты подписок пользователя.
+
+    Посты размечены ключом ленты feed_date/feed_id: для материализованной
+    ленты это поля TimelineEntry, и выборка идёт диапазоном по индексу
+    (user, -pub_date, -post). Посты популярных авторов, которые не
+    раскладываются, читаются при чтении только для этих авторов и
+    сливаются с материализованной лентой (MergedFeed). Авторы подписок
+    берутся из графа в памяти, и соединения с Follow нет; очень длинные
+    списки подписок, которые не поместятся в IN, читаются через Follow.
+    """
+    materialized = Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_id=F('timeline_entries__post_id'),
+    ).order_by('-feed_date', '-feed_id')
+    authors = follow_graph.following(user.pk)
+    popular = _popular(user, authors) if authors else []
+    if not popular:
+        return materialized
+    # в ленте могли остаться записи автора, пока он не стал популярным
+    on_read = Post.objects.filter(author_id__in=popular).annotate(
+        feed_date=F('pub_date'), feed_id=F('pk'),
+    ).order_by('-feed_date', '-feed_id')
+    return MergedFeed(
+        materialized.exclude(author_id__in=popular), on_read)
+
+
+FAN_OUT_SQL = '''
+INSERT INTO {timeline} (user_id, post_id, pub_date)
+SELECT follow.user_id, post.id, post.pub_date
+FROM {follow} follow
+JOIN {stats} stats ON stats.user_id = follow.author_id
+JOIN {post} post ON post.author_id = follow.author_id
+WHERE follow.author_id BETWEEN %s AND %s AND stats.followers_count <= %s
+'''
+
+
+def fan_out_authors(first_id, last_id):
+    """Раскладывает посты авторов с id в диапазоне по лентам подписчиков.
+
+    Одним INSERT ... SELECT для данных, вставленных в обход сигналов
+    (см. posts/generator.py); ленты этих авторов должны быть пусты, а
+    счётчики - заполнены. Возвращает число записей.
+    """
+    sql = FAN_OUT_SQL.format(
+        timeline=TimelineEntry._meta.db_table,
+        follow=Follow._meta.db_table,
+        stats=AuthorStats._meta.db_table,
+        post=Post._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql, [first_id, last_id, settings.TIMELINE_FANOUT_LIMIT])
+        return cursor.rowcount
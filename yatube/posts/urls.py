@@ -13,7 +13,10 @@ urlpatterns = [
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'),
     path('create/', views.post_create, name='post_create'),
+    path('search/', views.search, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/many/', views.follow_many, name='follow_many'),
+    path('unfollow/many/', views.unfollow_many, name='unfollow_many'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
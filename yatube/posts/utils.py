@@ -1,6 +1,140 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
 
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
-def page_from_paginator(post_list, page_number, nums_on_page=10):
-    paginator = Paginator(post_list, nums_on_page)
-    return paginator.get_page(page_number)
+# не больше параметров в IN, чем разрешают старые версии SQLite
+IN_LIMIT = 900
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+
+def encode_cursor(direction, obj, date_field='pub_date', key_field='pk'):
+    """Упаковывает ключ (дата, id) объекта в непрозрачную строку."""
+    date = getattr(obj, date_field).isoformat()
+    raw = f'{direction}|{date}|{getattr(obj, key_field)}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (direction, дата, id) или None для битого курсора."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, date, pk = raw.split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or date is None:
+        return None
+    return direction, date, pk
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (дата, id) без COUNT(*) и OFFSET.
+
+    Страница выбирается условием по ключу последнего (или первого)
+    объекта соседней страницы, поэтому стоимость запроса не зависит
+    от глубины листания. Номер страницы не известен, поэтому number
+    у страницы равен 1 (первая) или 2 (есть предыдущая), а num_pages
+    на единицу больше, если есть следующая: так штатные has_next и
+    has_previous у Page продолжают работать.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, cursor=None,
+                 date_field='pub_date', key_field='pk', descending=True,
+                 **kwargs):
+        self.date_field = date_field
+        self.key_field = key_field
+        self.descending = descending
+        super().__init__(
+            self._ordered(object_list, True), per_page, **kwargs)
+        self.cursor = decode_cursor(cursor)
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def _after(self, date, pk, forward):
+        """Условие «дальше ключа» в порядке ленты (или обратном)."""
+        lookup = 'lt' if self.descending == forward else 'gt'
+        return (
+            Q(**{f'{self.date_field}__{lookup}': date})
+            | Q(**{self.date_field: date, f'{self.key_field}__{lookup}': pk})
+        )
+
+    def _ordered(self, queryset, forward):
+        sign = '-' if self.descending == forward else ''
+        return queryset.order_by(
+            sign + self.date_field, sign + self.key_field)
+
+    def _fetch(self):
+        queryset = self.object_list
+        if self.cursor is None:
+            rows = list(queryset[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            return rows[:self.per_page], False, has_more
+        direction, date, pk = self.cursor
+        forward = direction == CURSOR_NEXT
+        rows = list(self._ordered(
+            queryset.filter(self._after(date, pk, forward)), forward
+        )[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            return rows, True, has_more
+        rows.reverse()
+        return rows, has_more, True
+
+    @cached_property
+    def _window(self):
+        return self._fetch()
+
+    @cached_property
+    def num_pages(self):
+        rows, has_previous, has_next = self._window
+        number = 2 if has_previous else 1
+        return number + 1 if has_next else number
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def get_page(self, number=None):
+        rows, has_previous, has_next = self._window
+        if rows and has_previous:
+            self.previous_cursor = encode_cursor(
+                CURSOR_PREVIOUS, rows[0], self.date_field, self.key_field)
+        if rows and has_next:
+            self.next_cursor = encode_cursor(
+                CURSOR_NEXT, rows[-1], self.date_field, self.key_field)
+        return Page(rows, 2 if has_previous else 1, self)
+
+    page = get_page
+
+
+def page_from_paginator(post_list, page_number, nums_on_page=10,
+                        cursor=None, **cursor_options):
+    """Страница ленты постов.
+
+    По умолчанию лента листается курсором (?cursor=...). Старые ссылки
+    вида ?page=N обслуживаются обычным Paginator с OFFSET.
+    """
+    if page_number is not None and cursor is None:
+        paginator = Paginator(post_list, nums_on_page)
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(
+        post_list, nums_on_page, cursor=cursor, **cursor_options)
+    return paginator.get_page()
+
+
+def chunks(items, size=IN_LIMIT):
+    """Части списка не длиннее size, например для запросов с IN."""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
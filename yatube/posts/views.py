@@ -1,28 +1,52 @@
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.views.decorators.http import require_POST
 
+from .conditional import (conditional_page, group_state, index_state,
+                          post_state, profile_state)
+from .counters import author_stats
+from .database import atomic_with_retry, write_with_retry
+from .follows import follow_authors, split_usernames, unfollow_authors
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import page_from_paginator
+from .loaders import get_group_or_404, get_user_or_404, loader
+from .models import Follow, Post
+from .page_cache import cached_page
+from .routers import read_own_writes, replica_reads
+from .search import SearchResults
+from .timeline import timeline_posts
+from .utils import CursorPaginator, page_from_paginator
 
+COMMENTS_ON_PAGE = 20
+SEARCH_RESULTS_ON_PAGE = 10
 
+
+@replica_reads
+@conditional_page(index_state)
+@cached_page(index_state)
 def index(request):
     template = 'posts/index.html'
-    page_obj = page_from_paginator(Post.objects.select_related(
-        'author', 'group').all(), request.GET.get('page'))
+    page_obj = page_from_paginator(
+        Post.objects.select_related('author', 'group').all(),
+        request.GET.get('page'), cursor=request.GET.get('cursor'))
     context = {
         'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+@replica_reads
+@conditional_page(group_state)
+@cached_page(group_state)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
+    group = get_group_or_404(request, slug)
     page_obj = page_from_paginator(
         group.posts.select_related(
-            'author', 'group').all(), request.GET.get('page'))
+            'author', 'group').all(), request.GET.get('page'),
+        cursor=request.GET.get('cursor'))
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -30,40 +54,62 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@replica_reads
+@conditional_page(profile_state)
+@cached_page(profile_state)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_user_or_404(request, username)
     page_obj = page_from_paginator(
         author.posts.select_related(
-            'author', 'group').all(), request.GET.get('page'))
-    if request.user.is_authenticated:
-        current_user = get_object_or_404(User, username=request.user)
-        following = Follow.objects.filter(
-            user=current_user, author=author).exists()
-    else:
-        following = False
+            'author', 'group').all(), request.GET.get('page'),
+        cursor=request.GET.get('cursor'))
     context = {
         'author': author,
+        'stats': author_stats(author),
         'page_obj': page_obj,
-        'following': following,
+        'following': loader(request).is_following(author),
     }
     return render(request, template, context)
 
 
+@replica_reads
+@conditional_page(post_state)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
+    comments = CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_ON_PAGE,
+        cursor=request.GET.get('cursor'),
+        date_field='created',
+        descending=False,
+    ).get_page()
     form_for_comment = CommentForm()
     context = {
         'post': post,
+        'author_stats': author_stats(post.author),
         'comments': comments,
         'form_for_comment': form_for_comment,
     }
     return render(request, template, context)
 
 
+@replica_reads
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(SearchResults(query), SEARCH_RESULTS_ON_PAGE)
+    context = {
+        'q': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+    }
+    return render(request, template, context)
+
+
 @login_required
+@atomic_with_retry
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -79,6 +125,7 @@ def post_create(request):
 
 
 @login_required
+@atomic_with_retry
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
     post = get_object_or_404(Post, pk=post_id)
@@ -100,6 +147,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@atomic_with_retry
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -111,13 +159,15 @@ def add_comment(request, post_id):
     return redirect('post:post_detail', post_id=post_id)
 
 
+@replica_reads
 @login_required
 def follow_index(request):
-    current_user = get_object_or_404(User, username=request.user)
-    list_posts_selected_authors = Post.objects.select_related(
-        'author', 'group').filter(author__following__user=current_user).all()
+    list_posts_selected_authors = timeline_posts(
+        request.user).select_related('author', 'group')
     page_obj = page_from_paginator(
-        list_posts_selected_authors, request.GET.get('page'))
+        list_posts_selected_authors, request.GET.get('page'),
+        cursor=request.GET.get('cursor'),
+        date_field='feed_date', key_field='feed_id')
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
@@ -125,16 +175,38 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     # subscribe to author "username"
-    current_user = get_object_or_404(User, username=request.user.username)
-    author = get_object_or_404(User, username=username)
-    Follow.objects.get_or_create(user=current_user, author=author)
+    author = get_user_or_404(request, username)
+    # пишет и на GET: транзакция только вокруг записи
+    write_with_retry(
+        request.path, Follow.objects.get_or_create,
+        user=request.user, author=author)
+    read_own_writes(request)
     return redirect('post:follow_index')
 
 
 @login_required
 def profile_unfollow(request, username):
     # Dislike, unsubscribe from author "username"
-    current_user = get_object_or_404(User, username=request.user.username)
-    author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=current_user, author=author).delete()
+    author = get_user_or_404(request, username)
+    write_with_retry(
+        request.path,
+        Follow.objects.filter(user=request.user, author=author).delete)
+    read_own_writes(request)
     return redirect('post:follow_index')
+
+
+@login_required
+@require_POST
+@atomic_with_retry
+def follow_many(request):
+    # subscribe to all authors from POST "authors", e.g. an imported list
+    usernames = split_usernames(request.POST.get('authors', ''))
+    return JsonResponse(follow_authors(request.user, usernames))
+
+
+@login_required
+@require_POST
+@atomic_with_retry
+def unfollow_many(request):
+    usernames = split_usernames(request.POST.get('authors', ''))
+    return JsonResponse(unfollow_authors(request.user, usernames))
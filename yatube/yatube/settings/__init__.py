@@ -0,0 +1,25 @@
+"""Настройки проекта.
+
+base - общие настройки, dev - для разработки, prod - боевые.
+Профиль выбирается переменной окружения YATUBE_PRODUCTION=True (prod),
+по умолчанию - dev. DJANGO_SETTINGS_MODULE остаётся yatube.settings.
+"""
+import os
+from copy import deepcopy
+
+if os.getenv('YATUBE_PRODUCTION') in ['True', 'true']:
+    from .prod import *  # noqa: F401,F403
+    from .prod import (MIDDLEWARE, TEMPLATE_LOADERS, TEMPLATE_TIMING,
+                       TEMPLATES)
+else:
+    from .dev import *  # noqa: F401,F403
+    from .dev import (MIDDLEWARE, TEMPLATE_LOADERS, TEMPLATE_TIMING,
+                      TEMPLATES)
+
+if TEMPLATE_TIMING:
+    TEMPLATES = deepcopy(TEMPLATES)
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('posts.template_timing.Loader', TEMPLATE_LOADERS)]
+    MIDDLEWARE = MIDDLEWARE + [
+        'posts.template_timing.template_timing_middleware']
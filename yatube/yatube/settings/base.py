@@ -0,0 +1,279 @@
+# Общие настройки профилей dev и prod, см. yatube/settings/__init__.py
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = os.getenv('DJANGO_SECRET_KEY', default='x)0jb33tt#patb^+ww&s3k)evxcjmwzn7djw@kwjpuj013+u@9')
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+# ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+    'www.sdvkam.pythonanywhere.com',
+    'sdvkam.pythonanywhere.com',
+]
+
+INTERNAL_IPS = [
+    '127.0.0.1',
+]
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',  # Application for registration and authorization of users
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'posts.apps.PostsConfig',  # First application added
+    'users.apps.UsersConfig',  # Our applicattion for work with users (changing standart)
+    'core.apps.CoreConfig',  # служебное приложение: и все сущности, касающиеся всего проекта в целом, хранить в нём.
+    'about.apps.AboutConfig',
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'posts.query_budget.query_budget_middleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'posts.routers.replica_middleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# загрузчики, которые подразумевает APP_DIRS: профили и замер
+# времени рендера оборачивают их в свои
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+# YATUBE_TEMPLATE_TIMING=True: время рендера шаблонов и вставок
+# в заголовке Server-Timing и в логе posts.template_timing
+TEMPLATE_TIMING = os.getenv('YATUBE_TEMPLATE_TIMING') in ['True', 'true']
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [TEMPLATES_DIR],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                # Добавлен конеткст-процессор
+                'core.context_processors.year.year',
+                'core.context_processors.admin_email.admin_email',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        # sqlite3 с BEGIN IMMEDIATE, см. posts/sqlite_backend
+        'ENGINE': 'posts.sqlite_backend',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # соединение живёт между запросами, не открывается на каждый
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+    }
+}
+
+# Реплики для чтения лент: пути к копиям базы через запятую в
+# DB_REPLICAS; см. posts/routers.py
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        # на реплику не пишут: обычный backend без BEGIN IMMEDIATE
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        # в тестах реплика - та же тестовая база
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['posts.routers.ReplicaRouter']
+# Столько секунд после записи сессия читает из основной базы
+REPLICA_STICKY_SECONDS = 10
+
+# PRAGMA для каждого нового соединения с SQLite, см. posts/database.py
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # отрицательное значение - в КиБ
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+}
+# PRAGMA для соединений с репликами: только чтение, журнал и
+# synchronous на копии не меняются
+SQLITE_REPLICA_PRAGMAS = {
+    'query_only': 1,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+}
+# Повторы пишущих транзакций, которым SQLite ответил database is
+# locked; пауза удваивается с каждой попыткой
+SQLITE_WRITE_RETRIES = 5
+SQLITE_RETRY_BACKOFF = 0.02
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+LOGIN_URL = 'users:login'
+LOGIN_REDIRECT_URL = 'post:index'
+# LOGOUT_REDIRECT_URL = 'post:index'
+
+# движок filebased.EmailBackend for save letter to folder EMAIL_FILE_PATH
+# EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Настройки для вашего email разместите в файле .env
+EMAIL_HOST = os.getenv('MY_EMAIL_HOST')
+EMAIL_PORT = int(os.getenv('MY_EMAIL_PORT'))
+EMAIL_HOST_USER = os.getenv('MY_EMAIL_HOST_USER')
+EMAIL_HOST_PASSWORD = os.getenv('MY_EMAIL_HOST_PASSWORD')
+EMAIL_USE_TLS = os.getenv('MY_EMAIL_USE_TLS') in ['True', 'true']
+EMAIL_USE_SSL = os.getenv('MY_EMAIL_USE_SSL') in ['True', 'true']
+SERVER_EMAIL = EMAIL_HOST_USER
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# указываем директорию, в которую будут складываться файлы писем
+# EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
+
+CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# CACHE_BACKEND=sqlite в окружении включает общий для всех процессов
+# кеш в файле; у locmem своя копия кеша в каждом процессе
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sqlite': {
+        'BACKEND': 'posts.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'MAX_SIZE': 64 * 1024 * 1024,
+        },
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'locmem')],
+    # фрагменты шаблонов и тяжёлые значения из представлений: устаревшее
+    # значение отдаётся, пока его пересчитывает один запрос
+    'template_fragments': {
+        'BACKEND': 'posts.cache_backends.StaleWhileRevalidateCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'GRACE': 60,
+            'LOCK_TIMEOUT': 10,
+        },
+    },
+}
+
+# Посты авторов, у которых подписчиков больше этого числа, не
+# раскладываются по лентам подписчиков, а подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Как часто процесс сверяет граф подписок в памяти с изменениями других
+# процессов (posts/follow_graph.py); свои изменения видны сразу
+FOLLOW_GRAPH_SYNC_INTERVAL = 1
+
+# Время жизни страниц и фрагментов лент в кеше; устаревают они по сигналам
+FEED_CACHE_TIMEOUT = 60 * 60 * 3
+
+# Миниатюры картинок строятся после сохранения поста в фоновых потоках
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# Загружаемые картинки уменьшаются до этого размера по большей стороне
+IMAGE_MAX_SIZE = 1600
+IMAGE_QUALITY = 85
+
+# Бюджет SQL-запросов на страницу по имени URL; превышения пишутся
+# в лог posts.query_budget, в строгом режиме - исключение
+QUERY_BUDGETS = {
+    'post:index': 6,
+    'post:group_list': 8,
+    'post:profile': 12,
+    'post:post_detail': 8,
+    'post:follow_index': 8,
+    'post:post_create': 8,
+    'post:search': 6,
+    # запросов тем больше, чем больше авторов: пачки по IN_LIMIT
+    'post:follow_many': None,
+    'post:unfollow_many': None,
+}
+QUERY_BUDGET_DEFAULT = 20
+QUERY_BUDGET_STRICT = False
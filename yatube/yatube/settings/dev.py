@@ -0,0 +1,14 @@
+# Профиль для разработки: DEBUG, debug toolbar, шаблоны без кеша
+from copy import deepcopy
+
+from .base import *  # noqa: F401,F403
+from .base import INSTALLED_APPS, MIDDLEWARE, TEMPLATES
+
+DEBUG = True
+
+INSTALLED_APPS = INSTALLED_APPS + ['debug_toolbar']
+MIDDLEWARE = MIDDLEWARE + ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
+TEMPLATES = deepcopy(TEMPLATES)
+TEMPLATES[0]['OPTIONS']['context_processors'].insert(
+    0, 'django.template.context_processors.debug')
@@ -0,0 +1,15 @@
+# Боевой профиль: без debug toolbar, раздачи статики и media из
+# urls.py и контекст-процессора debug; шаблоны компилируются один раз
+# на процесс
+from copy import deepcopy
+
+from .base import *  # noqa: F401,F403
+from .base import TEMPLATE_LOADERS, TEMPLATES
+
+DEBUG = False
+
+TEMPLATE_LOADERS = [
+    ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+TEMPLATES = deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = TEMPLATE_LOADERS